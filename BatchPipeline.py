@@ -0,0 +1,233 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from timeseries_tools.TimeSeriesTransform import TimeSeriesTransform as tst
+
+
+class BatchPipeline(object):
+    """按地市流水线执行 读取数据库 -> 数据转换 -> 生成raw.e文件 -> 输出测算报告 的批量测算流程
+
+    读取下一个地市数据的同时转换、写出当前地市数据, 转换结果缓存在cache_dir下, 再次运行时直接读取缓存。
+    需在timeseries_tools所在目录下运行, 例如:
+        python -m timeseries_tools.BatchPipeline ./job.json
+
+    任务配置为json文件或字典, 示例:
+        {
+            "source": {"type": "mysql", "user": "xx", "password": "xx", "host": "xx", "port": 3306},
+            "load_sql": "SELECT * FROM LOAD_96 WHERE CITY_ID = {city_id}",
+            "weather_sql": "SELECT * FROM WEATHER_96 WHERE CITY_ID = {city_id}",
+            "cities": [1, 2, 3],
+            "caliber_id": 1,
+            "s_date": "20210101",
+            "e_date": "20211231",
+            "output_dir": "./output",
+            "forecast_path": "./forecast/{city_id}.csv"
+        }
+
+    source.type 可填入'mysql','dm7','sqlite','csv', 为'sqlite'时host为数据库文件路径,
+    为'csv'时需填写load_path和weather_path(原始库表结构的csv文件), 不需要load_sql和weather_sql。
+    数据库数据源也可用load_table和weather_table代替load_sql和weather_sql, 此时由TimeSeriesTransform.buildQuery
+    生成只查询所需地市、口径、日期及时刻列的参数化查询。
+    可选配置: labels(raw.e中负荷、气象数据标签), cache_dir(默认为output_dir/cache, 填入false不使用缓存),
+    prefetch(预读取地市数, 默认为1), time_interval(测算报告的时间区间)。
+
+    Parameters
+    ----------
+    config
+        任务配置
+    """
+    def __init__(self,config:dict):
+        self.config = config
+        self.source = config['source']
+        if self.source['type'] not in ['mysql','dm7','sqlite','csv']:
+            raise ValueError('source type can only be entered "mysql", "dm7", "sqlite" or "csv" !')
+        self.cities = config['cities']
+        self.output_dir = config.get('output_dir','./output')
+        self.cache_dir = config.get('cache_dir',os.path.join(self.output_dir,'cache'))
+        self.prefetch = max(int(config.get('prefetch',1)),1)
+        self.labels = {'load':'LoadHistory','weather':'WeatherHistory'}
+        self.labels.update(config.get('labels',{}))
+
+        self.__csv_data = {}
+        self.__lock = threading.Lock()
+        self.__stats = {}
+
+    @classmethod
+    def fromFile(cls,path:str):
+        """从json配置文件创建流水线
+
+        Parameters
+        ----------
+        path
+            json配置文件路径
+        """
+        with open(path,encoding='utf8') as f:
+            return cls(json.load(f))
+
+    def __record(self,stage:str,seconds:float,rows:int):
+        """累计各阶段耗时与处理行数"""
+        with self.__lock:
+            stat = self.__stats.setdefault(stage,[0.0,0,0])
+            stat[0] += seconds
+            stat[1] += rows
+            stat[2] += 1
+
+    def __cachePath(self,city_id,kind:str):
+        """缓存文件路径, 由地市与数据源配置生成, 配置变化后缓存自动失效; csv数据源同时以文件修改时间和大小为键, 文件更新后缓存失效"""
+        key = {k:self.config.get(k) for k in ['source','load_sql','weather_sql','load_table','weather_table','caliber_id','s_date','e_date']}
+        key['city_id'] = city_id
+        if self.source['type'] == 'csv':
+            for src in ['load','weather']:
+                path = self.source.get('{}_path'.format(src))
+                if path and os.path.exists(path):
+                    stat = os.stat(path)
+                    key['{}_file'.format(src)] = [stat.st_mtime_ns,stat.st_size]
+        digest = hashlib.md5(json.dumps(key,sort_keys=True,default=str).encode('utf8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir,'{}_{}_{}.pkl'.format(city_id,kind,digest))
+
+    def __query(self,kind:str,city_id)->pd.DataFrame:
+        """读取单个地市的原始负荷或气象数据"""
+        if self.source['type'] == 'csv':
+            path = self.source.get('{}_path'.format(kind))
+            if not path:
+                return None
+            if kind not in self.__csv_data:
+                self.__csv_data[kind] = pd.read_csv(path)
+            df = self.__csv_data[kind]
+            return df[df['CITY_ID'].astype(int)==int(city_id)].copy()
+
+        table = self.config.get('{}_table'.format(kind))
+        if table:
+            sql,params = tst().buildQuery(table,kind,self.source['type'],city_id=city_id,caliber_id=self.config.get('caliber_id')
+                                          ,s_date=self.config.get('s_date'),e_date=self.config.get('e_date'))
+        else:
+            sql,params = self.config.get('{}_sql'.format(kind)),None
+            if not sql:
+                return None
+            sql = sql.format(city_id=city_id)
+        return tst().connectDB(self.source.get('user'),self.source.get('password'),self.source.get('host')
+                               ,self.source.get('port'),sql,self.source['type'],params=params)
+
+    def __fetch(self,city_id):
+        """读取阶段: 命中缓存时直接返回转换后的数据, 否则从数据源读取原始数据"""
+        if self.cache_dir:
+            paths = [self.__cachePath(city_id,kind) for kind in ['load','weather']]
+            if all(os.path.exists(p) for p in paths):
+                start = time.perf_counter()
+                load,weather = [pd.read_pickle(p) for p in paths]
+                self.__record('cache',time.perf_counter()-start,len(load))
+                return True,load,weather
+
+        start = time.perf_counter()
+        raw_load = self.__query('load',city_id)
+        raw_weather = self.__query('weather',city_id)
+        rows = len(raw_load) + (len(raw_weather) if raw_weather is not None else 0)
+        self.__record('fetch',time.perf_counter()-start,rows)
+        return False,raw_load,raw_weather
+
+    def __transform(self,city_id,raw_load,raw_weather):
+        """转换阶段: 将原始数据转换为日期+96时刻的形式, 并写入缓存"""
+        start = time.perf_counter()
+        load = tst().transLoad(raw_load,city_id=int(city_id),caliber_id=self.config.get('caliber_id'))
+        if raw_weather is not None:
+            weather = tst().transWeather(raw_weather,city_id=int(city_id))
+        else:
+            weather = pd.DataFrame()
+        if self.cache_dir:
+            os.makedirs(self.cache_dir,exist_ok=True)
+            load.to_pickle(self.__cachePath(city_id,'load'))
+            weather.to_pickle(self.__cachePath(city_id,'weather'))
+        self.__record('transform',time.perf_counter()-start,len(load)+len(weather))
+        return load,weather
+
+    def __writeEfile(self,city_id,load:pd.DataFrame,weather:pd.DataFrame):
+        """写出阶段: 生成该地市的raw.e文件"""
+        from timeseries_tools.InsertEFile import InsertEFile
+
+        start = time.perf_counter()
+        batch_insert_dict = {}
+        for kind,df in [('load',load),('weather',weather)]:
+            if len(df) > 0:
+                df = df.rename(columns={'DATE':'Date'})
+                df['Date'] = pd.to_datetime(df['Date']).dt.strftime('%Y%m%d')
+                batch_insert_dict[self.labels[kind]] = df
+        path = os.path.join(self.output_dir,'{}_raw.e'.format(city_id))
+        InsertEFile(self.config['s_date'],self.config['e_date'],path,batch_insert_dict).GenerateEfile()
+        self.__record('efile',time.perf_counter()-start,len(load)+len(weather))
+
+    def __report(self,city_id,load:pd.DataFrame):
+        """报告阶段: 配置了forecast_path时, 输出该地市的测算报告"""
+        from timeseries_tools.TimeSeriseTestReport import TimeSeriseTestReport
+
+        fc_path = self.config.get('forecast_path')
+        if not fc_path:
+            return
+        start = time.perf_counter()
+        real_load = load.copy()
+        real_load['DATE'] = pd.to_datetime(real_load['DATE']).dt.strftime('%Y-%m-%d')
+        fc_load = pd.read_csv(fc_path.format(city_id=city_id))
+        fc_load = fc_load.rename(columns={fc_load.columns[0]:'DATE'})
+        fc_load['DATE'] = pd.to_datetime(fc_load['DATE'].astype(str)).dt.strftime('%Y-%m-%d')
+
+        kwargs = {'path':os.path.join(self.output_dir,'{}_TestReport.txt'.format(city_id))}
+        if self.config.get('time_interval'):
+            kwargs['time_interval'] = self.config['time_interval']
+        TimeSeriseTestReport('DATE').outputReport(real_load,fc_load,**kwargs)
+        self.__record('report',time.perf_counter()-start,len(real_load))
+
+    def __output(self,city_id,load,weather):
+        self.__writeEfile(city_id,load,weather)
+        self.__report(city_id,load)
+
+    def run(self)->pd.DataFrame:
+        """执行流水线
+
+        Returns
+        -------
+            各阶段调用次数、耗时、处理行数及吞吐量(行/秒)的Dataframe
+        """
+        os.makedirs(self.output_dir,exist_ok=True)
+        self.__stats = {}
+        start = time.perf_counter()
+
+        # 读取与写出各使用一个后台线程, 主线程负责数据转换
+        with ThreadPoolExecutor(max_workers=1) as fetch_pool, ThreadPoolExecutor(max_workers=1) as output_pool:
+            fetching = [fetch_pool.submit(self.__fetch,c) for c in self.cities[:self.prefetch]]
+            outputs = []
+            for i,city_id in enumerate(self.cities):
+                is_cached,load,weather = fetching.pop(0).result()
+                if i+self.prefetch < len(self.cities):
+                    fetching.append(fetch_pool.submit(self.__fetch,self.cities[i+self.prefetch]))
+                if not is_cached:
+                    load,weather = self.__transform(city_id,load,weather)
+                outputs.append(output_pool.submit(self.__output,city_id,load,weather))
+                print('---- 地市{}数据处理完成'.format(city_id))
+            for future in outputs:
+                future.result()
+
+        stats = pd.DataFrame.from_dict(self.__stats,orient='index',columns=['seconds','rows','calls'])
+        stats['rows_per_sec'] = stats['rows']/stats['seconds']
+        stats.loc['total'] = [time.perf_counter()-start,None,len(self.cities),None]
+        print('==== 各阶段吞吐量 ====')
+        print(stats)
+        return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='批量测算流水线: 数据库 -> 数据转换 -> raw.e -> 测算报告')
+    parser.add_argument('config',help='任务配置json文件路径')
+    args = parser.parse_args(argv)
+    BatchPipeline.fromFile(args.config).run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
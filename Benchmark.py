@@ -0,0 +1,295 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from timeseries_tools.TimeSeriesTransform import TimeSeriesTransform as tst
+
+
+def _rawColumns(freq:int=96):
+    """生成原始库表中的时刻列, 原始库表均包含T2400列"""
+    return tst().num2freq[freq] + ['T2400']
+
+
+def GenerateLoadData(city_num:int=3,years:int=1,s_date:str='2020-01-01',freq:int=96,caliber_num:int=1,seed:int=0)->pd.DataFrame:
+    """生成与原始负荷库表结构一致的模拟负荷数据, 相同参数下结果完全一致
+
+    Parameters
+    ----------
+    city_num
+        地市数量, by default 3
+    years
+        年数, by default 1
+    s_date
+        起始日期, by default '2020-01-01'
+    freq
+        时刻点数, 可填入96、48、24, by default 96
+    caliber_num
+        口径数量, by default 1
+    seed
+        随机数种子, by default 0
+
+    Returns
+    -------
+        形如ID, CALIBER_ID, DATE, CITY_ID, T0000...T2400, CREATETIME, UPDATETIME的Dataframe
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(s_date,periods=365*years,freq='d')
+    cols = _rawColumns(freq)
+    n_day,n_point = len(dates),len(cols)
+
+    # 日内曲线: 午高峰与晚高峰叠加
+    x = np.linspace(0,24,n_point)
+    daily = 0.7 + 0.2*np.exp(-(x-11)**2/8) + 0.25*np.exp(-(x-19)**2/6)
+    # 季节与星期效应
+    season = 1 + 0.15*np.cos(2*np.pi*(dates.dayofyear.values-200)/365)
+    weekly = np.where(dates.weekday.values>=5,0.9,1.0)
+
+    frames = []
+    for city in range(1,city_num+1):
+        base = 1000*city*rng.uniform(0.8,1.2)
+        for caliber in range(1,caliber_num+1):
+            values = base*np.outer(season*weekly,daily)*(1+0.02*rng.standard_normal((n_day,n_point)))
+            df = pd.DataFrame(np.round(values,2),columns=cols)
+            df.insert(0,'CITY_ID',city)
+            df.insert(0,'DATE',dates.strftime('%Y-%m-%d'))
+            df.insert(0,'CALIBER_ID',caliber)
+            frames.append(df)
+    df = pd.concat(frames,ignore_index=True)
+    df.insert(0,'ID',np.arange(1,len(df)+1))
+    df['CREATETIME'] = s_date
+    df['UPDATETIME'] = s_date
+    return df
+
+
+def GenerateWeatherData(city_num:int=3,years:int=1,s_date:str='2020-01-01',freq:int=96,seed:int=0)->pd.DataFrame:
+    """生成与原始气象库表结构一致的模拟温度数据, 相同参数下结果完全一致
+
+    Parameters
+    ----------
+    city_num
+        地市数量, by default 3
+    years
+        年数, by default 1
+    s_date
+        起始日期, by default '2020-01-01'
+    freq
+        时刻点数, 可填入96、48、24, by default 96
+    seed
+        随机数种子, by default 0
+
+    Returns
+    -------
+        形如ID, TYPE, DATE, CITY_ID, T0000...T2400, CREATETIME, UPDATETIME的Dataframe
+    """
+    rng = np.random.default_rng(seed+1)
+    dates = pd.date_range(s_date,periods=365*years,freq='d')
+    cols = _rawColumns(freq)
+    n_day,n_point = len(dates),len(cols)
+
+    x = np.linspace(0,24,n_point)
+    diurnal = 4*np.sin(2*np.pi*(x-9)/24)
+    season = 15 - 12*np.cos(2*np.pi*(dates.dayofyear.values-15)/365)
+
+    frames = []
+    for city in range(1,city_num+1):
+        offset = rng.uniform(-3,3)
+        values = season[:,None] + offset + diurnal[None,:] + rng.standard_normal((n_day,n_point))
+        df = pd.DataFrame(np.round(values,1),columns=cols)
+        df.insert(0,'CITY_ID',city)
+        df.insert(0,'DATE',dates.strftime('%Y-%m-%d'))
+        df.insert(0,'TYPE',1)
+        frames.append(df)
+    df = pd.concat(frames,ignore_index=True)
+    df.insert(0,'ID',np.arange(1,len(df)+1))
+    df['CREATETIME'] = s_date
+    df['UPDATETIME'] = s_date
+    return df
+
+
+class Benchmark(object):
+    """用于测量各数据转换、精度统计及E文件生成操作的耗时与内存峰值, 并与基准结果对比
+
+    需在timeseries_tools所在目录下运行, 例如:
+        python -m timeseries_tools.Benchmark --cities 3 --years 2 --baseline ./bench_baseline.json
+
+    Parameters
+    ----------
+    city_num
+        模拟地市数量, by default 3
+    years
+        模拟年数, by default 1
+    repeat
+        每个操作重复计时次数, 取最小耗时, by default 3
+    seed
+        随机数种子, by default 0
+    """
+    def __init__(self,city_num:int=3,years:int=1,repeat:int=3,seed:int=0):
+        self.city_num = city_num
+        self.years = years
+        self.repeat = repeat
+        self.raw_load = GenerateLoadData(city_num,years,seed=seed)
+        self.raw_weather = GenerateWeatherData(city_num,years,seed=seed)
+
+        # 单地市日期+96时刻数据, 用于table2col及精度统计
+        self.real_load = tst().transLoad(self.raw_load.copy(),city_id=1)
+        rng = np.random.default_rng(seed+2)
+        self.fc_load = self.real_load.copy()
+        self.fc_load[tst().freq96] = self.fc_load[tst().freq96].values*(1+0.03*rng.standard_normal((len(self.fc_load),96)))
+        self.col_load = tst().table2col(self.real_load.copy(),time_col='DATE')
+
+    def __operations(self):
+        """待测量的操作, key为操作名称, value为无参函数"""
+        from timeseries_tools.InsertEFile import InsertEFile
+        from timeseries_tools.TimeSeriseTestReport import TimeSeriseTestReport
+
+        def efile():
+            with tempfile.TemporaryDirectory() as path:
+                e_load = self.real_load.rename(columns={'DATE':'Date'})
+                InsertEFile('20200101','20201231',os.path.join(path,'raw.e'),{'LoadHistory':e_load}).GenerateEfile()
+
+        # 报告对象只创建一次, 避免将读取节假日文件的耗时计入各操作; 不使用转换缓存, 保证重复计时结果一致
+        test_report = TimeSeriseTestReport('DATE',cache_size=0)
+
+        def report(method):
+            def func():
+                getattr(test_report,method)(self.real_load.copy(),self.fc_load.copy())
+            return func
+
+        return {
+            'transLoad':lambda: tst().transLoad(self.raw_load.copy()),
+            'transWeather':lambda: tst().transWeather(self.raw_weather.copy(),isStat=True),
+            'table2col':lambda: tst().table2col(self.real_load.copy(),time_col='DATE'),
+            'col2table':lambda: tst().col2table(self.col_load.copy(),time_col='DATE'),
+            'RMSPE':lambda: test_report.RMSPE(self.col_load['load'],self.col_load['load']*1.01),
+            'TimeShareEval':report('TimeShareEval'),
+            'WetherHolidayAcc':report('WetherHolidayAcc'),
+            'MonthlyAcc':report('MonthlyAcc'),
+            'WeeklyAcc':report('WeeklyAcc'),
+            'GenerateEfile':efile,
+        }
+
+    def run(self,operations:list=None)->pd.DataFrame:
+        """执行基准测试
+
+        Parameters
+        ----------
+        operations, optional
+            需要测量的操作名称列表, 默认为None测量全部操作
+
+        Returns
+        -------
+            形如operation, seconds, peak_mb, error的Dataframe
+        """
+        ops = self.__operations()
+        if operations:
+            ops = {k:v for k,v in ops.items() if k in operations}
+
+        result = []
+        for name,func in ops.items():
+            try:
+                # 屏蔽被测方法自身的打印信息
+                with contextlib.redirect_stdout(io.StringIO()):
+                    # 计时与内存测量分开进行, 避免tracemalloc影响耗时
+                    times = []
+                    for _ in range(self.repeat):
+                        start = time.perf_counter()
+                        func()
+                        times.append(time.perf_counter()-start)
+                    tracemalloc.start()
+                    func()
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                result.append([name,min(times),peak/1024/1024,None])
+            except Exception as e:
+                if tracemalloc.is_tracing():
+                    tracemalloc.stop()
+                result.append([name,np.nan,np.nan,'{}: {}'.format(type(e).__name__,e)])
+            print('{:<18}{:>10.4f}s{:>10.2f}MB  {}'.format(name,result[-1][1],result[-1][2],result[-1][3] or ''))
+        return pd.DataFrame(result,columns=['operation','seconds','peak_mb','error'])
+
+    def saveBaseline(self,result:pd.DataFrame,path:str):
+        """将基准测试结果保存为json文件
+
+        Parameters
+        ----------
+        result
+            run()的输出结果
+        path
+            基准文件路径
+        """
+        baseline = {
+            'city_num':self.city_num,
+            'years':self.years,
+            'result':result.set_index('operation')[['seconds','peak_mb']].dropna().to_dict(orient='index'),
+        }
+        with open(path,'w',encoding='utf8') as f:
+            json.dump(baseline,f,indent=2)
+
+    def compareBaseline(self,result:pd.DataFrame,path:str,tolerance:float=0.2)->pd.DataFrame:
+        """将基准测试结果与已保存的基准结果对比
+
+        Parameters
+        ----------
+        result
+            run()的输出结果
+        path
+            基准文件路径
+        tolerance, optional
+            允许的相对增幅, 超出则标记为回退, by default 0.2
+
+        Returns
+        -------
+            包含耗时比例、内存比例及是否回退(regression)的Dataframe, 执行出错或基准中不存在的操作均视为回退
+        """
+        with open(path,encoding='utf8') as f:
+            baseline = json.load(f)
+        if baseline['city_num'] != self.city_num or baseline['years'] != self.years:
+            raise ValueError('The baseline was recorded with city_num={}, years={}, please use the same data size !'.format(baseline['city_num'],baseline['years']))
+
+        base = pd.DataFrame.from_dict(baseline['result'],orient='index')
+        compare = result.set_index('operation')[['seconds','peak_mb','error']].join(base,rsuffix='_base',how='left')
+        compare['seconds_ratio'] = compare['seconds']/compare['seconds_base']
+        compare['peak_mb_ratio'] = compare['peak_mb']/compare['peak_mb_base']
+        # NaN与阈值比较恒为False, 出错(耗时为NaN)或缺少基准的操作需单独标记
+        compare['regression'] = ((compare['seconds_ratio']>1+tolerance) | (compare['peak_mb_ratio']>1+tolerance)
+                                 | compare['error'].notna() | compare['seconds_ratio'].isna() | compare['peak_mb_ratio'].isna())
+        print('==== 与基准结果对比 ====')
+        print(compare[['seconds','seconds_ratio','peak_mb','peak_mb_ratio','regression','error']].to_string())
+        return compare
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='timeseries_tools 性能基准测试')
+    parser.add_argument('--cities',type=int,default=3,help='模拟地市数量')
+    parser.add_argument('--years',type=int,default=1,help='模拟年数')
+    parser.add_argument('--repeat',type=int,default=3,help='每个操作重复计时次数')
+    parser.add_argument('--seed',type=int,default=0,help='随机数种子')
+    parser.add_argument('--ops',nargs='*',default=None,help='需要测量的操作名称, 默认测量全部')
+    parser.add_argument('--baseline',default=None,help='基准结果json文件路径')
+    parser.add_argument('--save-baseline',action='store_true',help='将本次结果保存为基准结果')
+    parser.add_argument('--tolerance',type=float,default=0.2,help='允许的相对增幅')
+    args = parser.parse_args(argv)
+
+    bench = Benchmark(args.cities,args.years,args.repeat,args.seed)
+    result = bench.run(args.ops)
+    if args.baseline and args.save_baseline:
+        bench.saveBaseline(result,args.baseline)
+        print('---- 基准结果已保存至{}'.format(args.baseline))
+    elif args.baseline:
+        compare = bench.compareBaseline(result,args.baseline,args.tolerance)
+        if compare['regression'].any():
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,252 @@
+import numpy as np
+import pandas as pd
+
+from timeseries_tools.TimeSeriseTestReport import TimeSeriseTestReport
+
+
+def _splitMonths(chunks,date_col:str='DATE'):
+    """将按日期排序的任意大小DataFrame分块重新切分为按月的分块
+
+    Yields
+    -------
+        (月份'YYYY-MM', 该月的DataFrame)
+    """
+    pending = None
+    for chunk in chunks:
+        if len(chunk) == 0:
+            continue
+        months = pd.to_datetime(chunk[date_col]).dt.strftime('%Y-%m')
+        if pending is not None:
+            chunk = pd.concat([pending[1],chunk],ignore_index=True)
+            months = pd.concat([pd.Series([pending[0]]*len(pending[1])),months],ignore_index=True)
+        chunk = chunk.reset_index(drop=True)
+        # 最后一个月可能延续到下一个分块, 暂不输出
+        last = months.iloc[-1]
+        for month,group in chunk.groupby(months.values,sort=True):
+            if month != last:
+                yield month,group
+        pending = (last,chunk[months.values==last])
+    if pending is not None:
+        yield pending
+
+
+def iterCsvMonths(path:str,date_col:str='DATE',chunksize:int=50000):
+    """按月分块读取日期+96时刻形式的csv文件, 文件需按日期升序排列
+
+    Parameters
+    ----------
+    path
+        csv文件路径
+    date_col, optional
+        日期列名称, by default 'DATE'
+    chunksize, optional
+        每次读取的行数, by default 50000
+
+    Yields
+    -------
+        (月份'YYYY-MM', 该月的DataFrame)
+    """
+    yield from _splitMonths(pd.read_csv(path,chunksize=chunksize),date_col)
+
+
+def iterCursorMonths(cursor,date_col:str='DATE',fetch_size:int=10000):
+    """按月分块读取已执行查询的数据库游标, 查询结果需为日期+96时刻的形式并按日期升序排列(ORDER BY)
+
+    Parameters
+    ----------
+    cursor
+        已执行查询语句的DB-API游标
+    date_col, optional
+        日期列名称, by default 'DATE'
+    fetch_size, optional
+        每次fetchmany的行数, by default 10000
+
+    Yields
+    -------
+        (月份'YYYY-MM', 该月的DataFrame)
+    """
+    columns = [str(col[0].split(',')[0]).upper() for col in cursor.description]
+
+    def chunks():
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield pd.DataFrame(rows,columns=columns)
+    yield from _splitMonths(chunks(),date_col)
+
+
+def iterStoreMonths(store,city_id,name:str,s_date=None,e_date=None,date_col:str='DATE'):
+    """按月分块读取HistoryStore中的序列
+
+    Parameters
+    ----------
+    store
+        HistoryStore对象
+    city_id
+        地市ID
+    name
+        序列名称
+    s_date, optional
+        起始日期, by default None
+    e_date, optional
+        结束日期, by default None
+    date_col, optional
+        日期列名称, by default 'DATE'
+
+    Yields
+    -------
+        (月份'YYYY-MM', 该月的DataFrame)
+    """
+    start,end = store.dateRange(city_id,name)
+    start = max(start,pd.Timestamp(s_date)) if s_date is not None else start
+    end = min(end,pd.Timestamp(e_date)) if e_date is not None else end
+    for month in pd.period_range(start,end,freq='M'):
+        m_start = max(month.start_time.normalize(),start)
+        m_end = min(month.end_time.normalize(),end)
+        yield str(month),store.toTable(city_id,name,m_start,m_end,time_col=date_col)
+
+
+class ChunkedReport(TimeSeriseTestReport):
+    """用于按月分块计算测算报告, 逐块累计outputReport中各项指标的充分统计量, 内存占用只与分块大小有关
+
+    示例:
+        report = ChunkedReport('DATE')
+        report.run(iterCsvMonths('./real.csv'),iterCsvMonths('./forecast.csv'))
+        report.writeReport('./TestReport.txt')
+
+    按月分块与一次性读入全部数据时, 输出的测算报告与TimeSeriseTestReport.outputReport完全一致。
+
+    Parameters
+    ----------
+    date_col
+        日期列名称
+    time_interval, optional
+        时间区间, 用于计算不同时间区间的最大负荷与最小负荷的平均精度, by default [[1,7],[8,12],[13,16],[17,19],[20,23]]
+    isDelHoliday, optional
+        是否剔除节假日, by default True
+    """
+    def __init__(self,date_col:str,time_interval=[[1,7],[8,12],[13,16],[17,19],[20,23]],isDelHoliday=True):
+        super().__init__(date_col,cache_size=0)
+        self.time_interval = time_interval
+        self.isDelHoliday = isDelHoliday
+        self.reset()
+
+    def reset(self):
+        """清空已累计的统计量"""
+        # 每日精度及分组标签, 每天只保留一行, 远小于原始数据
+        self.__daily = []
+        # 各时刻误差平方和与点数
+        self.__point_sq = np.zeros(len(self.freq96))
+        self.__point_n = np.zeros(len(self.freq96))
+        # 各时间区间最大/最小负荷时刻的误差平方和与点数
+        self.__peak = np.zeros((len(self.time_interval),2))
+        self.__valley = np.zeros((len(self.time_interval),2))
+
+    def update(self,real_chunk:pd.DataFrame,fc_chunk:pd.DataFrame):
+        """累计一个分块的统计量, 数据格式需为日期+96时刻负荷值的形式, 同一日期只能出现在一个分块中
+
+        Parameters
+        ----------
+        real_chunk
+            实际负荷分块
+        fc_chunk
+            预测负荷分块
+        """
+        aligned = self.AlignMatrix(real_chunk,fc_chunk)
+        dates,r,p = aligned
+        if len(dates) == 0:
+            return
+        daily_acc = self.DailyAcc(real_chunk,fc_chunk,aligned=aligned)
+        self.__daily.append(daily_acc)
+
+        if self.isDelHoliday:
+            keep = (daily_acc['daytype']!='holiday').values
+            r,p = r[keep],p[keep]
+
+        # 分时刻精度
+        sq = np.square((p - r)/r)
+        point_valid = ~np.isnan(sq)
+        self.__point_sq += np.where(point_valid,sq,0).sum(0)
+        self.__point_n += point_valid.sum(0)
+
+        # 分时段最大/最小负荷精度
+        for i,times in enumerate(self.time_interval):
+            for state,is_max in [(self.__peak,True),(self.__valley,False)]:
+                mask = self.ExtremeMask(r,p,times,isMax=is_max)
+                state[i] += [sq[mask].sum(),mask.sum()]
+
+    def run(self,real_months,fc_months):
+        """按月份对齐两个分块迭代器并逐块累计统计量, 只在一侧存在的月份将被跳过
+
+        Parameters
+        ----------
+        real_months
+            实际负荷的(月份, DataFrame)迭代器, 如iterCsvMonths、iterCursorMonths、iterStoreMonths的输出
+        fc_months
+            预测负荷的(月份, DataFrame)迭代器
+
+        Returns
+        -------
+            self
+        """
+        real_months,fc_months = iter(real_months),iter(fc_months)
+        real,fc = next(real_months,None),next(fc_months,None)
+        while real is not None and fc is not None:
+            if real[0] == fc[0]:
+                self.update(real[1],fc[1])
+                real,fc = next(real_months,None),next(fc_months,None)
+            elif real[0] < fc[0]:
+                real = next(real_months,None)
+            else:
+                fc = next(fc_months,None)
+        return self
+
+    def result(self)->dict:
+        """根据已累计的统计量计算各项指标, 格式与TimeSeriseTestReport中对应方法的输出一致
+
+        Returns
+        -------
+            key为holiday_acc, no_holiday_acc, every_points_acc, every_month_acc, time_interval_max, time_interval_min, week_day_acc的字典
+        """
+        if self.__daily:
+            daily_acc = pd.concat(self.__daily).sort_index()
+        else:
+            daily_acc = self.DailyAcc(pd.DataFrame(columns=[self.date_col]+self.freq96),pd.DataFrame(columns=[self.date_col]+self.freq96))
+        is_holiday = daily_acc['daytype'] == 'holiday'
+        holiday_acc = float(daily_acc.loc[is_holiday,'rmspe'].mean())
+        no_holiday_acc = float(daily_acc.loc[~is_holiday,'rmspe'].mean())
+        if self.isDelHoliday:
+            daily_acc = daily_acc[~is_holiday]
+
+        with np.errstate(invalid='ignore',divide='ignore'):
+            every_points_acc = pd.DataFrame({'rmspe_mean':1-np.sqrt(self.__point_sq/self.__point_n)},index=self.freq96)
+            time_interval_max = [[times,1-np.sqrt(sq/n)] for times,(sq,n) in zip(self.time_interval,self.__peak)]
+            time_interval_min = [[times,1-np.sqrt(sq/n)] for times,(sq,n) in zip(self.time_interval,self.__valley)]
+
+        every_month_acc = daily_acc.resample('M')['rmspe'].mean().to_frame().reset_index()
+        every_month_acc[self.date_col] = every_month_acc[self.date_col].dt.strftime('%Y-%m')
+        week_acc = daily_acc.groupby('weekday')['rmspe'].mean().reindex(range(1,8))
+
+        return {
+            'holiday_acc':holiday_acc,
+            'no_holiday_acc':no_holiday_acc,
+            'every_points_acc':every_points_acc,
+            'every_month_acc':every_month_acc,
+            'time_interval_max':time_interval_max,
+            'time_interval_min':time_interval_min,
+            'week_day_acc':[[w,acc] for w,acc in week_acc.items()],
+        }
+
+    def writeReport(self,path='./TestReport.txt'):
+        """将已累计的测算结果写入测算报告文件, 格式与TimeSeriseTestReport.outputReport一致
+
+        Parameters
+        ----------
+        path, optional
+            输出文件存储路径, by default './TestReport.txt'
+        """
+        result = self.result()
+        self.saveReport(path,result['holiday_acc'],result['no_holiday_acc'],result['every_points_acc'],result['every_month_acc']
+                        ,result['time_interval_max'],result['time_interval_min'],result['week_day_acc'])
+        return result
@@ -0,0 +1,356 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from timeseries_tools.HistoryStore import HistoryStore
+from timeseries_tools.TimeSeriesTransform import TimeSeriesTransform as tst
+from timeseries_tools.TimeSeriseTestReport import TimeSeriseTestReport
+
+
+class EvalService(object):
+    """常驻内存的本地测算服务, 实际负荷、气象等序列从HistoryStore读取, 预测负荷可来自HistoryStore或csv文件
+
+    节假日等日历数据只在启动时读取一次; 各序列的日期+96时刻数据、table2col转换结果及每日精度均缓存在内存中(LRU淘汰),
+    同一序列的不同日期区间、不同分组方式的查询只需对缓存结果切片、分组。缓存以序列版本为键, HistoryStore有新数据写入
+    或预测csv文件被重新导出(修改时间、大小变化)后自动重新读取。锁只用于读写缓存, 各查询的计算并发进行。
+    需在timeseries_tools所在目录下运行, 例如:
+        python -m timeseries_tools.EvalService --store ./history --port 8765
+        curl "http://127.0.0.1:8765/metrics?city=1&fc=fc_algo109&start=2021-01-01&end=2021-06-30&by=month,daytype"
+
+    接口(均为GET, 参数通过url传入, 返回json):
+        /health     服务状态及各缓存条目数
+        /series     HistoryStore中的地市及序列目录
+        /metrics    整体平均精度及按by(year,month,weekday,daytype,season, 逗号分隔)分组的平均精度
+        /daily      每日精度及分组标签
+        /timeshare  各时刻平均精度
+        /compare    fc填入多个逗号分隔的预测序列, 返回contrastAlgoN的metrics与win_rate
+        /curve      实际、预测负荷及气象(weather参数)的逐点曲线, 用于前端绘图
+        /weather    气象序列的日统计值(stats参数, 见TimeSeriesTransform.weatherStat)
+    公共参数: city(地市ID), real(实际负荷序列名, 默认load), fc(预测序列名), start, end(日期区间), isDelHoliday(0/1)。
+    POST /clear 清空全部缓存。
+
+    Parameters
+    ----------
+    store_path
+        HistoryStore数据目录
+    forecast_dir, optional
+        预测负荷csv目录, HistoryStore中不存在fc序列时读取forecast_dir/<city>/<fc>.csv(日期+96时刻), by default None
+    cache_size, optional
+        每类缓存的最大条目数, by default 64
+    """
+    def __init__(self,store_path:str,forecast_dir:str=None,cache_size:int=64):
+        self.store_path = store_path
+        self.forecast_dir = forecast_dir
+        self.cache_size = cache_size
+        self.store = HistoryStore(store_path)
+        self.report = TimeSeriseTestReport('DATE',cache_size=0)
+        self.__index_mtime = self.__indexMtime()
+        self.__lock = threading.RLock()
+        # redirect_stdout会替换全局sys.stdout, 需串行执行
+        self.__print_lock = threading.Lock()
+        self.__caches = {'table':OrderedDict(),'curve':OrderedDict(),'daily':OrderedDict()}
+        self.__hits = {name:[0,0] for name in self.__caches}
+        self.__routes = {'/health':self.__health,'/series':self.__series,'/metrics':self.__metrics,'/daily':self.__daily
+                         ,'/timeshare':self.__timeshare,'/compare':self.__compare,'/curve':self.__curve,'/weather':self.__weather}
+
+    def __indexMtime(self):
+        path = os.path.join(self.store_path,'index.json')
+        return os.stat(path).st_mtime_ns if os.path.exists(path) else None
+
+    def __cached(self,cache_name:str,key,func):
+        """从指定缓存中读取结果, 未命中时调用func计算并写入缓存, 超出cache_size时淘汰最久未使用的条目
+
+        计算过程不持有锁, 同一条目被并发请求时可能重复计算, 结果相同
+        """
+        cache = self.__caches[cache_name]
+        with self.__lock:
+            if key in cache:
+                cache.move_to_end(key)
+                self.__hits[cache_name][0] += 1
+                return cache[key]
+            self.__hits[cache_name][1] += 1
+        value = func()
+        with self.__lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        return value
+
+    def clearCache(self):
+        """清空全部缓存"""
+        with self.__lock:
+            for cache in self.__caches.values():
+                cache.clear()
+
+    def __refresh(self):
+        """HistoryStore目录文件变化(有新数据写入)时重新读取目录并清空缓存"""
+        mtime = self.__indexMtime()
+        if mtime != self.__index_mtime:
+            with self.__lock:
+                if mtime != self.__index_mtime:
+                    self.store = HistoryStore(self.store_path)
+                    self.__index_mtime = mtime
+                    self.clearCache()
+
+    def __csvPath(self,city_id,name:str):
+        """序列不在HistoryStore中且forecast_dir下存在对应csv文件时返回文件路径, 否则返回None"""
+        try:
+            self.store.dateRange(city_id,name)
+            return None
+        except KeyError:
+            pass
+        if not self.forecast_dir or not re.match(r'^[\w\-]+$',name) or not re.match(r'^[\w\-]+$',str(city_id)):
+            return None
+        path = os.path.join(self.forecast_dir,str(city_id),'{}.csv'.format(name))
+        return path if os.path.exists(path) else None
+
+    def __version(self,city_id,name:str)->tuple:
+        """序列的版本标识, HistoryStore中的序列为目录文件修改时间, csv文件为文件修改时间与大小"""
+        path = self.__csvPath(city_id,name)
+        if path is None:
+            return ('store',self.__index_mtime)
+        stat = os.stat(path)
+        return ('csv',stat.st_mtime_ns,stat.st_size)
+
+    def __loadTable(self,city_id,name:str)->pd.DataFrame:
+        """读取序列的日期+96时刻数据, 日期列为DatetimeIndex以便按区间切片"""
+        path = self.__csvPath(city_id,name)
+        if path is None:
+            try:
+                df = self.store.toTable(city_id,name)
+            except KeyError:
+                if self.forecast_dir:
+                    raise KeyError('Series "{}" of city "{}" is neither in the store nor in "{}" !'.format(name,city_id,self.forecast_dir))
+                raise
+        else:
+            df = pd.read_csv(path)
+            df = df.rename(columns={df.columns[0]:'DATE'})
+            df['DATE'] = pd.to_datetime(df['DATE'].astype(str)).dt.strftime('%Y-%m-%d')
+            df,_ = tst().dropDuplicateDates(df,'DATE',policy='first')
+        df = df.set_index(pd.to_datetime(df['DATE'])).sort_index()
+        df.index.name = None
+        return df
+
+    def table(self,city_id,name:str)->pd.DataFrame:
+        """带缓存的序列读取"""
+        key = (str(city_id),name) + self.__version(city_id,name)
+        return self.__cached('table',key,lambda: self.__loadTable(city_id,name))
+
+    def curve(self,city_id,name:str)->pd.Series:
+        """带缓存的table2col转换结果"""
+        def convert():
+            df = self.table(city_id,name)
+            return tst().table2col(df.reset_index(drop=True),time_col='DATE',y_col=name,freq=len(df.columns)-1)[name]
+        key = (str(city_id),name) + self.__version(city_id,name)
+        return self.__cached('curve',key,convert)
+
+    def daily(self,city_id,real:str,fc:str)->pd.DataFrame:
+        """带缓存的每日精度, 按实际与预测序列的全部共同日期计算一次"""
+        key = (str(city_id),real,fc,self.__version(city_id,real),self.__version(city_id,fc))
+        return self.__cached('daily',key
+                             ,lambda: self.report.DailyAcc(self.table(city_id,real).reset_index(drop=True),self.table(city_id,fc).reset_index(drop=True)))
+
+    def handle(self,path:str,params:dict)->dict:
+        """处理一次查询, 供HTTP接口调用, 也可在进程内直接调用
+
+        Parameters
+        ----------
+        path
+            接口路径, 如'/metrics'
+        params
+            查询参数字典, value为字符串
+
+        Returns
+        -------
+            可json序列化的字典
+        """
+        if path not in self.__routes:
+            raise KeyError('Unknown path "{}", available: {}'.format(path,list(self.__routes)))
+        start = time.perf_counter()
+        self.__refresh()
+        result = self.__routes[path](params)
+        result['elapsed_ms'] = round((time.perf_counter()-start)*1000,3)
+        return result
+
+    def __required(self,params:dict,*names):
+        values = []
+        for name in names:
+            if not params.get(name):
+                raise ValueError('Parameter "{}" is required !'.format(name))
+            values.append(params[name])
+        return values
+
+    def __flag(self,params:dict,name:str)->bool:
+        return params.get(name,'0').lower() in ['1','true']
+
+    def __slice(self,df,params:dict):
+        return df.loc[params.get('start') or None:params.get('end') or None]
+
+    def __records(self,df:pd.DataFrame)->list:
+        df = df.copy()
+        for col in df.columns[[pd.api.types.is_datetime64_any_dtype(t) for t in df.dtypes]]:
+            df[col] = df[col].dt.strftime('%Y-%m-%d')
+        return json.loads(df.to_json(orient='records',force_ascii=False))
+
+    def __dailyFrame(self,params:dict)->pd.DataFrame:
+        city_id,fc = self.__required(params,'city','fc')
+        daily_acc = self.__slice(self.daily(city_id,params.get('real','load'),fc),params)
+        if self.__flag(params,'isDelHoliday'):
+            daily_acc = daily_acc[daily_acc['daytype']!='holiday']
+        return daily_acc
+
+    def __health(self,params:dict)->dict:
+        with self.__lock:
+            return {'status':'ok','cache':{name:{'size':len(cache),'hits':self.__hits[name][0],'misses':self.__hits[name][1]}
+                                           for name,cache in self.__caches.items()}}
+
+    def __series(self,params:dict)->dict:
+        return {'series':self.__records(self.store.cities())}
+
+    def __metrics(self,params:dict)->dict:
+        daily_acc = self.__dailyFrame(params)
+        rmspe = daily_acc['rmspe']
+        result = {'overall':{'rmspe':None if rmspe.count() == 0 else float(rmspe.mean()),'days':int(rmspe.count())}}
+        by = [b for b in params.get('by','').split(',') if b]
+        if by:
+            for key in by:
+                if key not in ['year','month','weekday','daytype','season']:
+                    raise ValueError('"{}" is not supported, "by" can only be entered "year", "month", "weekday", "daytype" or "season" !'.format(key))
+            # 与TimeSeriseTestReport.GroupedAcc一致
+            result['groups'] = self.__records(daily_acc.groupby(by)['rmspe'].agg(rmspe='mean',days='count').reset_index())
+        return result
+
+    def __daily(self,params:dict)->dict:
+        daily_acc = self.__dailyFrame(params)
+        return {'daily':self.__records(daily_acc.reset_index())}
+
+    def __timeshare(self,params:dict)->dict:
+        city_id,fc = self.__required(params,'city','fc')
+        real_load = self.__slice(self.table(city_id,params.get('real','load')),params)
+        fc_load = self.__slice(self.table(city_id,fc),params)
+        if self.__flag(params,'isDelHoliday'):
+            real_load = real_load[~real_load['DATE'].isin(self.report.holidays)]
+        _,r,p = self.report.AlignMatrix(real_load.reset_index(drop=True),fc_load.reset_index(drop=True))
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore',category=RuntimeWarning)
+            acc = 1 - np.sqrt(np.nanmean(np.square((p - r)/r),axis=0))
+        return {'timeshare':self.__records(pd.DataFrame({'point':list(real_load.columns[1:]),'rmspe':acc}))}
+
+    def __compare(self,params:dict)->dict:
+        city_id,fc = self.__required(params,'city','fc')
+        real = params.get('real','load')
+        real_load = self.__slice(self.table(city_id,real),params).reset_index(drop=True)
+        fc_loads = {name:self.__slice(self.table(city_id,name),params).reset_index(drop=True) for name in fc.split(',')}
+        # 屏蔽contrastAlgoN自身的打印信息
+        with self.__print_lock, contextlib.redirect_stdout(io.StringIO()):
+            result = self.report.contrastAlgoN(real_load,fc_loads,isDelHoliday=self.__flag(params,'isDelHoliday'))
+        return {'metrics':self.__records(result['metrics'].rename_axis('algo').reset_index())
+                ,'win_rate':self.__records(result['win_rate'].rename_axis('algo').reset_index())}
+
+    def __curve(self,params:dict)->dict:
+        city_id, = self.__required(params,'city')
+        names = [params.get('real','load')] + [n for n in params.get('fc','').split(',') + params.get('weather','').split(',') if n]
+        curves = pd.concat([self.__slice(self.curve(city_id,name),params) for name in names],axis=1)
+        curves.index = curves.index.strftime('%Y-%m-%d %H:%M')
+        return {'time':list(curves.index),'values':{name:json.loads(curves[name].to_json(orient='values')) for name in names}}
+
+    def __weather(self,params:dict)->dict:
+        city_id,name = self.__required(params,'city','name')
+        stats = [s for s in params.get('stats','MAX,MIN,AVG').split(',') if s]
+        df = self.__slice(self.table(city_id,name),params).reset_index(drop=True)
+        df['DATE'] = pd.to_datetime(df['DATE'])
+        result = tst().weatherStat(df,'DATE',stats=stats)
+        return {'weather':self.__records(result)}
+
+    def serve(self,host:str='127.0.0.1',port:int=8765,quiet:bool=False):
+        """启动HTTP服务, 阻塞运行直至KeyboardInterrupt
+
+        Parameters
+        ----------
+        host, optional
+            监听地址, 默认只监听本机, by default '127.0.0.1'
+        port, optional
+            监听端口, 为0时由系统分配, by default 8765
+        quiet, optional
+            是否关闭访问日志, by default False
+        """
+        server = self.createServer(host,port,quiet)
+        print('---- 测算服务已启动: http://{}:{}'.format(*server.server_address[:2]))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+    def createServer(self,host:str='127.0.0.1',port:int=8765,quiet:bool=False)->ThreadingHTTPServer:
+        """创建未启动的HTTP服务对象, 可在后台线程中调用serve_forever(), 便于本机测试"""
+        handler = type('EvalHandler',(_EvalHandler,),{'service':self,'quiet':quiet})
+        return ThreadingHTTPServer((host,port),handler)
+
+
+class _EvalHandler(BaseHTTPRequestHandler):
+    service = None
+    quiet = False
+
+    def __send(self,status:int,payload:dict):
+        body = json.dumps(payload,ensure_ascii=False,default=str).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.send_header('Content-Length',str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k:v[-1] for k,v in parse_qs(url.query).items()}
+        try:
+            self.__send(200,self.service.handle(url.path,params))
+        except KeyError as e:
+            self.__send(404,{'error':str(e.args[0]) if e.args else str(e)})
+        except (ValueError,TypeError) as e:
+            self.__send(400,{'error':str(e)})
+        except Exception as e:
+            self.__send(500,{'error':'{}: {}'.format(type(e).__name__,e)})
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/clear':
+            self.__send(404,{'error':'Unknown path "{}"'.format(self.path)})
+            return
+        self.service.clearCache()
+        self.__send(200,{'status':'ok'})
+
+    def log_message(self,format,*args):
+        if not self.quiet:
+            super().log_message(format,*args)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='本地常驻测算服务(HTTP/JSON)')
+    parser.add_argument('--store',required=True,help='HistoryStore数据目录')
+    parser.add_argument('--forecast-dir',default=None,help='预测负荷csv目录, 文件为<地市ID>/<序列名>.csv')
+    parser.add_argument('--host',default='127.0.0.1',help='监听地址')
+    parser.add_argument('--port',type=int,default=8765,help='监听端口')
+    parser.add_argument('--cache-size',type=int,default=64,help='每类缓存的最大条目数')
+    parser.add_argument('--quiet',action='store_true',help='关闭访问日志')
+    args = parser.parse_args(argv)
+    EvalService(args.store,args.forecast_dir,args.cache_size).serve(args.host,args.port,args.quiet)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
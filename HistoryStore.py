@@ -0,0 +1,223 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from timeseries_tools.TimeSeriesTransform import TimeSeriesTransform as tst
+
+
+class HistoryStore(object):
+    """用于长期保存各地市的负荷、气象等日期+96时刻数据, 每条序列保存为 天数×时刻数 的float32内存映射文件
+
+    目录结构:
+        path/index.json             地市目录及各序列的起始日期、天数、时刻数
+        path/<city_id>/<name>.f32   天数×时刻数的float32矩阵, 日期连续, 缺失日期为NaN
+
+    按日期区间读取时只映射所需的行, 不会将整个文件读入内存。
+
+    示例:
+        store = HistoryStore('./history')
+        store.append(1,'load',load_df)
+        real_load = store.toTable(1,'load','2021-01-01','2021-12-31')
+
+    Parameters
+    ----------
+    path
+        数据存储目录, 不存在时自动创建
+    """
+    def __init__(self,path:str):
+        self.path = path
+        self.__index_path = os.path.join(path,'index.json')
+        os.makedirs(path,exist_ok=True)
+        if os.path.exists(self.__index_path):
+            with open(self.__index_path,encoding='utf8') as f:
+                self.index = json.load(f)
+        else:
+            self.index = {'cities':{}}
+
+    def __saveIndex(self):
+        """先写临时文件再替换, 避免写入中断导致目录损坏"""
+        tmp_path = self.__index_path + '.tmp'
+        with open(tmp_path,'w',encoding='utf8') as f:
+            json.dump(self.index,f,ensure_ascii=False,indent=2)
+        os.replace(tmp_path,self.__index_path)
+
+    def __dataPath(self,city_id,name:str):
+        return os.path.join(self.path,str(city_id),'{}.f32'.format(name))
+
+    def __meta(self,city_id,name:str)->dict:
+        city = self.index['cities'].get(str(city_id))
+        if city is None or name not in city['series']:
+            raise KeyError('Series "{}" of city "{}" is not in the store !'.format(name,city_id))
+        return city['series'][name]
+
+    def addCity(self,city_id,city_name:str=None):
+        """在地市目录中登记地市
+
+        Parameters
+        ----------
+        city_id
+            地市ID
+        city_name, optional
+            地市名称, by default None
+        """
+        city = self.index['cities'].setdefault(str(city_id),{'name':city_name,'series':{}})
+        if city_name is not None:
+            city['name'] = city_name
+        self.__saveIndex()
+
+    def cities(self)->pd.DataFrame:
+        """返回地市目录
+
+        Returns
+        -------
+            形如CITY_ID, NAME, SERIES, START, END, POINTS的Dataframe, 每条序列一行
+        """
+        rows = []
+        for city_id,city in self.index['cities'].items():
+            for name,meta in city['series'].items():
+                end = pd.Timestamp(meta['start']) + pd.Timedelta(days=meta['days']-1)
+                rows.append([city_id,city['name'],name,meta['start'],str(end)[0:10],meta['points']])
+            if not city['series']:
+                rows.append([city_id,city['name'],None,None,None,None])
+        return pd.DataFrame(rows,columns=['CITY_ID','NAME','SERIES','START','END','POINTS'])
+
+    def dateRange(self,city_id,name:str):
+        """返回序列的起止日期
+
+        Returns
+        -------
+            (起始日期, 结束日期)
+        """
+        meta = self.__meta(city_id,name)
+        start = pd.Timestamp(meta['start'])
+        return start,start + pd.Timedelta(days=meta['days']-1)
+
+    def append(self,city_id,name:str,df:pd.DataFrame,time_col:str='DATE'):
+        """写入日期+96时刻/48时刻/24时刻数据, 序列不存在时新建; 与已有日期重叠时覆盖已有数据, 与已有日期不连续时以NaN补齐
+
+        Parameters
+        ----------
+        city_id
+            地市ID
+        name
+            序列名称, 如'load','temperature'
+        df
+            待写入数据, 数据列数必须为97、49、25列其中之一, 同时, 需包含日期列
+        time_col, optional
+            日期列名称, by default 'DATE'
+        """
+        if time_col not in df.columns and time_col == df.index.name:
+            df = df.reset_index()
+        elif time_col not in df.columns:
+            raise KeyError('"{}" is not in the column or index of "df" !'.format(time_col))
+        point_cols = [c for c in df.columns if c != time_col]
+        points = len(point_cols)
+        if points not in [96,48,24]:
+            raise TypeError('The number of "df" columns needs to be 97, 49 or 25, please adjust the input dataframe')
+
+        dates = pd.to_datetime(df[time_col])
+        # 按日期计算行号, 写入前检查日期, 避免写入错误的行
+        if dates.isna().any():
+            raise ValueError('There are empty dates in "df", please remove them first !')
+        if (dates != dates.dt.normalize()).any():
+            raise ValueError('The dates in "df" need to be daily (00:00:00), please adjust the input dataframe')
+        if dates.duplicated().any():
+            raise ValueError('There are duplicate dates in "df", please remove them first (e.g. dropDuplicateDates) !')
+        values = df[point_cols].apply(pd.to_numeric,errors='coerce').values.astype(np.float32)
+
+        if str(city_id) not in self.index['cities']:
+            self.addCity(city_id)
+        series = self.index['cities'][str(city_id)]['series']
+        path = self.__dataPath(city_id,name)
+        os.makedirs(os.path.dirname(path),exist_ok=True)
+
+        new_start,new_end = dates.min(),dates.max()
+        if name in series:
+            meta = series[name]
+            if meta['points'] != points:
+                raise ValueError('Series "{}" of city "{}" has {} points per day, but "df" has {} !'.format(name,city_id,meta['points'],points))
+            old_start = pd.Timestamp(meta['start'])
+            old_days = meta['days']
+        else:
+            old_start,old_days = new_start,0
+
+        start = min(old_start,new_start)
+        days = max((old_start - start).days + old_days,(new_end - start).days + 1)
+
+        if old_days > 0 and start < old_start:
+            # 向前扩展时需整体后移已有数据
+            old = np.fromfile(path,dtype=np.float32).reshape(old_days,points)
+            data = np.full((days,points),np.nan,dtype=np.float32)
+            shift = (old_start - start).days
+            data[shift:shift+old_days] = old
+            data.tofile(path)
+        else:
+            # 向后扩展时直接在文件末尾追加NaN行
+            with open(path,'ab') as f:
+                f.write(np.full((days-old_days,points),np.nan,dtype=np.float32).tobytes())
+
+        mm = np.memmap(path,dtype=np.float32,mode='r+',shape=(days,points))
+        mm[(dates - start).dt.days.values] = values
+        mm.flush()
+        del mm
+
+        series[name] = {'start':str(start)[0:10],'days':int(days),'points':points}
+        self.__saveIndex()
+
+    def read(self,city_id,name:str,s_date=None,e_date=None):
+        """按日期区间读取序列, 仅映射所需的行, 不将文件读入内存
+
+        Parameters
+        ----------
+        city_id
+            地市ID
+        name
+            序列名称
+        s_date, optional
+            起始日期, 默认为None从序列起始日期开始
+        e_date, optional
+            结束日期, 默认为None至序列结束日期
+
+        Returns
+        -------
+            (DatetimeIndex, 只读的 天数×时刻数 np.memmap)
+        """
+        meta = self.__meta(city_id,name)
+        start = pd.Timestamp(meta['start'])
+        i0 = 0 if s_date is None else max((pd.Timestamp(s_date) - start).days,0)
+        i1 = meta['days'] if e_date is None else min((pd.Timestamp(e_date) - start).days + 1,meta['days'])
+        dates = pd.date_range(start + pd.Timedelta(days=i0),periods=max(i1-i0,0),freq='d')
+        if i1 <= i0:
+            return dates,np.empty((0,meta['points']),dtype=np.float32)
+        mm = np.memmap(self.__dataPath(city_id,name),dtype=np.float32,mode='r'
+                       ,offset=i0*meta['points']*4,shape=(i1-i0,meta['points']))
+        return dates,mm
+
+    def toTable(self,city_id,name:str,s_date=None,e_date=None,time_col:str='DATE',date_format:str='%Y-%m-%d')->pd.DataFrame:
+        """按日期区间导出为日期+96时刻/48时刻/24时刻的Dataframe, 可直接用于InsertEFile和TimeSeriseTestReport
+
+        Parameters
+        ----------
+        city_id
+            地市ID
+        name
+            序列名称
+        s_date, optional
+            起始日期, by default None
+        e_date, optional
+            结束日期, by default None
+        time_col, optional
+            日期列名称, InsertEFile中为'Date', by default 'DATE'
+        date_format, optional
+            日期格式, raw.e文件中为'%Y%m%d', by default '%Y-%m-%d'
+
+        Returns
+        -------
+            DataFrame
+        """
+        dates,mm = self.read(city_id,name,s_date,e_date)
+        df = pd.DataFrame(np.array(mm),columns=tst().num2freq[mm.shape[1]])
+        df.insert(0,time_col,dates.strftime(date_format))
+        return df
@@ -23,6 +23,7 @@ class InsertEFile(object):
             E文件的保存路径
         batch_insert_dict:
             需要批量插入的数据及其标签, 在传入前需存储为 key:数据标签(String), value:待插入数据(Dataframe)的字典形式, 该参数默认为None。
+            value也可以为DataFrame分块的可迭代对象(如生成器、分块查询结果), 或返回DataFrame/DataFrame分块的无参函数, 此时数据将逐块写入文件, 标题只写入一次, 无需将全部历史数据加载至内存。
 
     """
     def __init__(self,s_date,e_date,path_file,batch_insert_dict=None):
@@ -37,7 +38,7 @@ class InsertEFile(object):
         path_file
             E文件的保存路径。
         batch_insert_dict, optional
-            需要批量插入的数据及其标签, 在传入前需存储为key:数据标签(String), value:待插入数据(Dataframe)的字典形式, 该参数默认为None, by default None
+            需要批量插入的数据及其标签, 在传入前需存储为key:数据标签(String), value:待插入数据(Dataframe)、DataFrame分块的可迭代对象或无参函数的字典形式, 该参数默认为None, by default None
         """        
         
         self.path_file = path_file
@@ -131,6 +132,45 @@ class InsertEFile(object):
             result_content = label_start + header + content + label_end
         return result_content
 
+    def __writeChunks(self,f,chunks,label_str:str):
+        """将DataFrame分块逐块写入.e文件, 标签与标题只写入一次
+
+        Parameters
+        ----------
+        f
+            已打开的.e文件对象
+        chunks
+            DataFrame分块的可迭代对象
+        label_str
+            待插入数据的标签
+        """
+
+        label_start = '\n'+'<'+ label_str +'>'+'\n'
+        label_end = '\n'+'<'+'/'+label_str +'>'+'\n'
+        f.write(label_start)
+        # 标题只按第一个分块的列名写入一次, 与分块之间的换行分开判断
+        header_written = False
+        has_rows = False
+        for temp_df in chunks:
+            if not isinstance(temp_df,pd.DataFrame):
+                raise TypeError("batch_insert_dict 的value分块格式有误,需要传入Dataframe类型")
+            if not header_written:
+                f.write('  '.join(['@'] + [str(i) for i in temp_df.columns]) + '\n')
+                header_written = True
+            if len(temp_df) <=0:
+                continue
+            # 分块之间以换行分隔
+            if has_rows:
+                f.write('\n')
+            temp_df = temp_df.copy()
+            temp_df.insert(0,'@',"#")
+            f.write(temp_df.to_string(header=False,index=False))
+            has_rows = True
+        # 空的分块迭代器也需写入标题, 与DataFrame形式一致
+        if not header_written:
+            f.write('  '.join(['@'] + self.col_name) + '\n')
+        f.write(label_end)
+
     def __SaveBaseInfo2E(self):
         """将默认信息存储至.e文件中
         """        
@@ -162,13 +202,18 @@ class InsertEFile(object):
                 raise TypeError("batch_insert_dict传入值有误，请传入dict类型")
             with open(self.path_file,'a',encoding='utf8') as f:
                 for label,df in self.batch_insert_dict.items():
-                    if not isinstance(df,pd.DataFrame):
-                        raise TypeError("batch_insert_dict 的value格式有误,需要传入Dataframe类型")
-                    elif not isinstance(label,str):
+                    if not isinstance(label,str):
                         raise TypeError("batch_insert_dict 的key格式有误,需要传入str类型")
+                    # 无参函数在写入时才调用, 以便按需生成数据
+                    if callable(df):
+                        df = df()
+                    if isinstance(df,pd.DataFrame):
+                        f.write(self.__convertDataFrame(df.copy(),label))
+                    elif hasattr(df,'__iter__') and not isinstance(df,(str,bytes,dict)):
+                        self.__writeChunks(f,df,label)
                     else:
-                        f.write(self.convertDataFrame(df,label))
-                        print('{}信息插入成功'.format(label))
+                        raise TypeError("batch_insert_dict 的value格式有误,需要传入Dataframe类型、DataFrame分块的可迭代对象或无参函数")
+                    print('{}信息插入成功'.format(label))
                 print('---- 自定义信息写入成功 ')
     
     def GenerateEfile(self):
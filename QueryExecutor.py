@@ -0,0 +1,119 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from timeseries_tools.TimeSeriesTransform import TimeSeriesTransform as tst
+
+
+class QueryExecutor(object):
+    """用于在有限线程池中并发执行多条查询(如多地市、多时间段的负荷与气象查询), 每条查询独立设置超时与重试次数
+
+    示例:
+        executor = QueryExecutor(user,password,host,port,'mysql',max_workers=8,timeout=60)
+        for key,df in executor.run(template='SELECT * FROM LOAD_96 WHERE CITY_ID = {city_id}',
+                                   params=[{'city_id':i} for i in range(1,21)],trans='load'):
+            ...
+
+    Parameters
+    ----------
+    user
+        数据库用户名
+    password
+        数据库密码
+    host
+        数据库host地址, dbType为'sqlite'时为数据库文件路径
+    port
+        数据库端口
+    dbType
+        数据库类型, 可输入'mysql','dm7','sqlite'
+    max_workers, optional
+        最大并发查询数, by default 4
+    timeout, optional
+        单条查询超时时间(秒), 达梦7暂不支持, by default None
+    retries, optional
+        查询失败(含超时)后的重试次数, by default 2
+    retry_wait, optional
+        首次重试前的等待时间(秒), 之后每次翻倍, by default 1.0
+    """
+    def __init__(self,user:str,password:str,host:str,port:int,dbType:str,max_workers:int=4,timeout:float=None,retries:int=2,retry_wait:float=1.0):
+        if dbType not in ['mysql','dm7','sqlite']:
+            raise ValueError('dbType can only be entered "mysql", "dm7" or "sqlite" !')
+        self.user = user
+        self.password = password
+        self.host = host
+        self.port = port
+        self.dbType = dbType
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_wait = retry_wait
+
+    def __query(self,sql,trans:str,trans_kwargs:dict)->pd.DataFrame:
+        """执行单条查询, 失败后按指数退避重试"""
+        sql,params = sql if isinstance(sql,tuple) else (sql,None)
+        for attempt in range(self.retries+1):
+            try:
+                df = tst().connectDB(self.user,self.password,self.host,self.port,sql,self.dbType,timeout=self.timeout,params=params)
+                break
+            except Exception as e:
+                if attempt >= self.retries:
+                    raise RuntimeError('Query failed after {} attempts: {}'.format(attempt+1,sql)) from e
+                time.sleep(self.retry_wait*2**attempt)
+
+        if trans == 'load':
+            df = tst().transLoad(df,**trans_kwargs)
+        elif trans == 'weather':
+            df = tst().transWeather(df,**trans_kwargs)
+        return df
+
+    def run(self,sqls=None,template:str=None,params:list=None,trans:str=None,trans_kwargs:dict=None):
+        """并发执行查询, 按完成先后顺序逐个返回结果
+
+        Parameters
+        ----------
+        sqls, optional
+            sql语句列表, 或key为查询名称、value为sql语句的字典, sql语句也可为buildQuery生成的(sql, params)元组
+        template, optional
+            sql模板, 使用str.format语法, 与params配合使用
+        params, optional
+            sql模板的参数列表, 每个元素为一个参数字典
+        trans, optional
+            查询结果的转换方式, 可填入None,'load','weather', 分别对应不转换、transLoad、transWeather, by default None
+        trans_kwargs, optional
+            传入transLoad或transWeather的其它参数, by default None
+
+        Yields
+        -------
+            (key, DataFrame), key为sqls字典的键, 或sqls列表/params列表中的序号
+        """
+        if trans not in [None,'load','weather']:
+            raise ValueError('The "trans" can only be entered as None, "load" or "weather"!')
+        if sqls is not None and template is not None:
+            raise ValueError('Only one of "sqls" and "template" can be entered !')
+        if template is not None:
+            sqls = {i:template.format(**p) for i,p in enumerate(params or [])}
+        elif not isinstance(sqls,dict):
+            sqls = dict(enumerate(sqls or []))
+        trans_kwargs = trans_kwargs or {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self.__query,sql,trans,trans_kwargs):key for key,sql in sqls.items()}
+            try:
+                for future in as_completed(futures):
+                    yield futures[future],future.result()
+            finally:
+                # 出错或提前停止迭代时取消尚未开始的查询
+                for future in futures:
+                    future.cancel()
+
+    def runAll(self,sqls=None,template:str=None,params:list=None,trans:str=None,trans_kwargs:dict=None)->dict:
+        """并发执行全部查询, 按输入顺序返回结果字典, 参数同run()
+
+        Returns
+        -------
+            key为查询名称或序号, value为查询结果的字典
+        """
+        result = dict(self.run(sqls,template,params,trans,trans_kwargs))
+        keys = sqls.keys() if isinstance(sqls,dict) else range(len(sqls if sqls is not None else params or []))
+        return {k:result[k] for k in keys}
@@ -2,6 +2,8 @@
 
 import pandas as pd 
 import numpy as np
+import re
+import warnings
 
 
 class TimeSeriesTransform(object):
@@ -34,18 +36,50 @@ class TimeSeriesTransform(object):
         }
     
 
-    def connectDB(self,user:str,password:str,host:str,port:int,sql:str,dbType:str)->pd.DataFrame:       
-        """用于读取达梦7或MYSQL数据库中的数据并转换为DataFrame
+    def __connect(self,user:str,password:str,host:str,port:int,dbType:str,timeout:float=None,autoCommit:bool=True):
+        """创建数据库连接
+
+        Args:
+        ----------
+            timeout (float): 单次查询超时时间(秒), mysql通过read_timeout实现, sqlite通过progress handler中断查询, 达梦7暂不支持, 默认为None不限制
+            autoCommit (bool): 达梦7是否自动提交, 批量写入时为False, 由调用方控制事务
+        """
+        if dbType == 'dm7':
+            import dmPython
+            conn = dmPython.connect(user=user, password=password, host=host, port=port, autoCommit=autoCommit)
+        elif dbType == 'mysql':
+            import pymysql
+            if timeout:
+                conn = pymysql.connect(user=user, password=password, host=host, port=port
+                                       , connect_timeout=int(max(timeout,1)), read_timeout=timeout)
+            else:
+                conn = pymysql.connect(user=user, password=password, host=host, port=port)
+        elif dbType == 'sqlite':
+            import sqlite3
+            import time
+            conn = sqlite3.connect(host, check_same_thread=False)
+            if timeout:
+                # 超时后progress handler返回非0值, sqlite中断当前查询并抛出OperationalError
+                deadline = time.monotonic() + timeout
+                conn.set_progress_handler(lambda: int(time.monotonic() > deadline), 1000)
+        else:
+            raise ValueError('dbType can only be entered "mysql", "dm7" or "sqlite" !')
+        return conn
+
+    def connectDB(self,user:str,password:str,host:str,port:int,sql:str,dbType:str,timeout:float=None,params=None)->pd.DataFrame:       
+        """用于读取达梦7或MYSQL数据库中的数据并转换为DataFrame, 本地调试时可使用sqlite代替
 
 
         Args:
         ----------
             user (str):  数据库用户名
             password (str): 数据库密码
-            host (str): 数据库host地址
+            host (str): 数据库host地址, dbType为'sqlite'时为数据库文件路径
             port (int): 数据库端口
             sql (str): 查询sql语句
-            dbType (str): 数据库类型,可输入'mysql','dm7'
+            dbType (str): 数据库类型,可输入'mysql','dm7','sqlite'
+            timeout (float): 查询超时时间(秒), 达梦7暂不支持, 默认为None不限制
+            params (list): sql语句中占位符对应的参数, 可由buildQuery生成, 默认为None
 
         Raises:
             ValueError: _description_
@@ -53,26 +87,213 @@ class TimeSeriesTransform(object):
         Returns:
             pd.DataFrame: 
         """
-        if dbType == 'dm7':
-            import dmPython
-            conn = dmPython.connect(user=user, password=password, host=host, port=port, autoCommit=True)
-        elif dbType == 'mysql':
-            import pymysql
-            conn = pymysql.connect(user=user, password=password, host=host, port=port)
-        else:
-            raise ValueError('dbType can only be entered "mysql" or "dm7" !')
-
-        cursor = conn.cursor()
-        cursor.execute(sql)
-        col_tmp = cursor.description
-        col_name = []
-        for i in range(len(col_tmp)):
-            col_name.append(col_tmp[i][0].split(',')[0])
-        res = cursor.fetchall()
+        conn = self.__connect(user,password,host,port,dbType,timeout)
+
+        try:
+            cursor = conn.cursor()
+            if params:
+                cursor.execute(sql,params)
+            else:
+                cursor.execute(sql)
+            col_tmp = cursor.description
+            col_name = []
+            for i in range(len(col_tmp)):
+                col_name.append(col_tmp[i][0].split(',')[0])
+            res = cursor.fetchall()
+        finally:
+            conn.close()
 
         df = pd.DataFrame(res,columns=[str(i).upper() for i in col_name])
         return df
 
+    def buildQuery(self,table:str,dataType:str='load',dbType:str='mysql',city_id=None,caliber_id=None,weather_type=None
+                   ,s_date=None,e_date=None,freq:int=96,time_col:str='DATE',cityid_col:str='CITY_ID',isUpdateTime:bool=True):
+        """生成负荷或气象库表的查询语句, 只查询日期、地市ID、所需时刻列及去重所需的列, 地市、口径、日期筛选在数据库中完成
+
+        未指定caliber_id(weather_type)时同时查询CALIBER_ID(TYPE)列, 以免transLoad(transWeather)将不同口径(类型)的数据当作重复数据合并;
+        同时查询UPDATETIME列, 供transLoad、transWeather按'latest'方式处理重复上传的数据, 两列均在转换时剔除
+
+        示例:
+            sql,params = tst().buildQuery('LOAD_96','load','mysql',city_id=[1,2],caliber_id=1,s_date='2021-01-01',e_date='2021-12-31')
+            df = tst().transLoad(tst().connectDB(user,password,host,port,sql,'mysql',params=params),isDelCitycol=False)
+
+        Args:
+        ----------
+            table (str): 表名
+            dataType (str): 数据类型, 可输入'load','weather'
+            dbType (str): 数据库类型, 可输入'mysql','dm7','sqlite', 决定参数占位符的形式
+            city_id (int|list): 需筛选的地市ID, 默认为None查询所有地市
+            caliber_id (int): 需筛选的口径ID, 仅用于负荷数据, 默认为None查询所有口径
+            weather_type (int): 需筛选的气象类型(TYPE), 仅用于气象数据, 默认为None查询所有类型
+            s_date (str): 起始日期, 形如'2021-01-01', 默认为None不限制
+            e_date (str): 结束日期, 默认为None不限制
+            freq (int): 时刻点数, 可输入96、48、24, 48、24时刻从96时刻库表中抽取整点列
+            time_col (str): 日期列名称
+            cityid_col (str): 地市ID列名称
+            isUpdateTime (bool): 是否查询UPDATETIME列, 库表中无该列时填入False
+
+        Returns:
+            (sql, params): 查询语句及参数列表, 可直接传入connectDB
+        """
+        if dataType not in ['load','weather']:
+            raise ValueError('dataType can only be entered "load" or "weather" !')
+        if dbType not in ['mysql','dm7','sqlite']:
+            raise ValueError('dbType can only be entered "mysql", "dm7" or "sqlite" !')
+        if freq not in self.num2freq:
+            raise ValueError('freq can only be entered 96, 48 or 24 !')
+        # 表名与列名无法参数化, 只允许字母、数字、下划线及库名分隔符
+        for name in [table,time_col,cityid_col]:
+            if not re.match(r'^[A-Za-z_][A-Za-z0-9_.]*$',str(name)):
+                raise ValueError('Invalid table or column name: "{}" !'.format(name))
+
+        holder = '%s' if dbType == 'mysql' else '?'
+        where,params = [],[]
+        if city_id is not None:
+            city_ids = list(city_id) if isinstance(city_id,(list,tuple,set)) else [city_id]
+            where.append('{} IN ({})'.format(cityid_col,', '.join([holder]*len(city_ids))))
+            params += [int(c) for c in city_ids]
+        if dataType == 'load' and caliber_id is not None:
+            where.append('CALIBER_ID = {}'.format(holder))
+            params.append(int(caliber_id))
+        if dataType == 'weather' and weather_type is not None:
+            where.append('TYPE = {}'.format(holder))
+            params.append(weather_type)
+        if s_date is not None:
+            where.append('{} >= {}'.format(time_col,holder))
+            params.append(pd.Timestamp(s_date).strftime('%Y-%m-%d'))
+        if e_date is not None:
+            where.append('{} <= {}'.format(time_col,holder))
+            params.append(pd.Timestamp(e_date).strftime('%Y-%m-%d'))
+
+        # 列顺序与transLoad、transWeather的重置列名顺序一致, 口径、类型及更新时间列在重置列名前剔除
+        columns = [time_col,cityid_col] + self.num2freq[freq]
+        if dataType == 'load' and caliber_id is None:
+            columns.append('CALIBER_ID')
+        if dataType == 'weather' and weather_type is None:
+            columns.append('TYPE')
+        if isUpdateTime:
+            columns.append('UPDATETIME')
+        sql = 'SELECT {} FROM {}'.format(', '.join(columns),table)
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY {}, {}'.format(cityid_col,time_col)
+        return sql,params
+
+    def __upsertSql(self,table:str,columns:list,key_cols:list,dbType:str,isUpsert:bool)->str:
+        """生成批量写入的sql语句, isUpsert为True时按key_cols更新已存在的数据"""
+        holder = '%s' if dbType == 'mysql' else '?'
+        col_str = ', '.join(columns)
+        value_str = ', '.join([holder]*len(columns))
+        update_cols = [c for c in columns if c not in key_cols]
+        if not isUpsert:
+            return 'INSERT INTO {} ({}) VALUES ({})'.format(table,col_str,value_str)
+        if not update_cols:
+            # 全部字段均为唯一键时, 已存在的数据保持不变
+            if dbType == 'mysql':
+                return 'INSERT IGNORE INTO {} ({}) VALUES ({})'.format(table,col_str,value_str)
+            if dbType == 'sqlite':
+                return 'INSERT INTO {} ({}) VALUES ({}) ON CONFLICT DO NOTHING'.format(table,col_str,value_str)
+        if dbType == 'mysql':
+            update_str = ', '.join(['{0} = VALUES({0})'.format(c) for c in update_cols])
+            return 'INSERT INTO {} ({}) VALUES ({}) ON DUPLICATE KEY UPDATE {}'.format(table,col_str,value_str,update_str)
+        if dbType == 'sqlite':
+            update_str = ', '.join(['{0} = excluded.{0}'.format(c) for c in update_cols])
+            return 'INSERT INTO {} ({}) VALUES ({}) ON CONFLICT ({}) DO UPDATE SET {}'.format(table,col_str,value_str,', '.join(key_cols),update_str)
+        # 达梦7使用MERGE INTO
+        source = ', '.join(['? AS {}'.format(c) for c in columns])
+        on_str = ' AND '.join(['T.{0} = S.{0}'.format(c) for c in key_cols])
+        insert_str = ', '.join(['S.{}'.format(c) for c in columns])
+        matched_str = ''
+        if update_cols:
+            matched_str = ' WHEN MATCHED THEN UPDATE SET ' + ', '.join(['T.{0} = S.{0}'.format(c) for c in update_cols])
+        return 'MERGE INTO {} T USING (SELECT {} FROM DUAL) S ON ({}){} WHEN NOT MATCHED THEN INSERT ({}) VALUES ({})'.format(
+            table,source,on_str,matched_str,col_str,insert_str)
+
+    def wide2long(self,df:pd.DataFrame,time_col:str='DATE',info_col:str='LOAD',point_col:str='TIME')->pd.DataFrame:
+        """
+        用于将日期(+其它标识列)+96时刻/48时刻/24时刻的横向数据转换为每个时刻一行的纵向数据,时刻列的值为'HH:MM'
+
+        Parameters:
+        ----------
+            df:Dataframe 输入数据, 时刻列名需为T0000,T0015,...的形式
+            time_col:str df中日期列的名称
+            info_col:str 转换后数值列的列名
+            point_col:str 转换后时刻列的列名
+        Returns:
+        ----------
+            DataFrame
+        """
+        point_cols = [c for c in self.freq96 if c in df.columns]
+        id_cols = [c for c in df.columns if c not in point_cols]
+        values = df[point_cols].values
+        result = pd.DataFrame({c:np.repeat(df[c].values,len(point_cols)) for c in id_cols})
+        result[point_col] = np.tile([c[1:3]+':'+c[3:5] for c in point_cols],len(df))
+        result[info_col] = values.ravel()
+        return result[[time_col]+[c for c in id_cols if c != time_col]+[point_col,info_col]]
+
+    def writeDB(self,df:pd.DataFrame,user:str,password:str,host:str,port:int,table:str,dbType:str,key_cols:list=None,time_col:str='DATE'
+                ,isWide2Long=False,info_col:str='LOAD',batch_size:int=5000,isUpsert=True)->int:
+        """用于将DataFrame批量写入达梦7或MYSQL数据库, 是connectDB的反向操作, 本地调试时可使用sqlite代替
+
+        每batch_size行使用一次executemany并提交一次事务, 某一批写入失败时回滚该批并抛出异常, 已提交的批次保留。
+
+
+        Args:
+        ----------
+            df (pd.DataFrame): 待写入数据, 列名需与数据库表字段名一致
+            user (str):  数据库用户名
+            password (str): 数据库密码
+            host (str): 数据库host地址, dbType为'sqlite'时为数据库文件路径
+            port (int): 数据库端口
+            table (str): 数据库表名
+            dbType (str): 数据库类型,可输入'mysql','dm7','sqlite'
+            key_cols (list): 唯一键字段, 数据已存在时按该字段更新, 默认为[time_col], isWide2Long为True时默认为[time_col,'TIME']。
+                mysql与sqlite需在表中对这些字段建立唯一索引
+            time_col (str): df中日期列的名称, datetime类型的日期将转为字符串写入
+            isWide2Long (bool): 是否先将T0000...T2345时刻列转换为TIME+info_col两列再写入
+            info_col (str): isWide2Long为True时数值列的字段名
+            batch_size (int): 每批写入的行数
+            isUpsert (bool): 是否按key_cols更新已存在的数据, 为False时直接插入
+
+        Returns:
+            int: 写入的行数
+        """
+        if isWide2Long:
+            df = self.wide2long(df,time_col=time_col,info_col=info_col)
+        if key_cols is None:
+            key_cols = [time_col,'TIME'] if isWide2Long else [time_col]
+        for col in key_cols:
+            if col not in df.columns:
+                raise KeyError('"{}" is not in the column of "df" !'.format(col))
+
+        df = df.copy()
+        for col in df.columns:
+            if pd.api.types.is_datetime64_any_dtype(df[col]):
+                has_time = (df[col].dropna() != df[col].dropna().dt.normalize()).any()
+                df[col] = df[col].dt.strftime('%Y-%m-%d %H:%M:%S' if has_time else '%Y-%m-%d')
+        # 转为python原生类型, 缺失值写入NULL
+        rows = df.astype(object).where(df.notna(),None).values.tolist()
+
+        sql = self.__upsertSql(table,list(df.columns),key_cols,dbType,isUpsert)
+        conn = self.__connect(user,password,host,port,dbType,autoCommit=False)
+        written = 0
+        try:
+            cursor = conn.cursor()
+            for i in range(0,len(rows),batch_size):
+                batch = rows[i:i+batch_size]
+                try:
+                    cursor.executemany(sql,batch)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    print('---- 第{}行起的批次写入失败, 已回滚, 此前已提交{}行'.format(i,written))
+                    raise
+                written += len(batch)
+        finally:
+            conn.close()
+        print('---- {}写入成功, 共{}行'.format(table,written))
+        return written
+
     def read_excel(self, path, sheet_name=None):
         """
         用于读取excel文件
@@ -105,7 +326,7 @@ class TimeSeriesTransform(object):
         self.df = pd.read_csv(path, index_col=0)
         return self.df.copy()
     
-    def transLoad(self,df:pd.DataFrame,time_col = 'DATE',cityid_col = 'CITY_ID',city_id:int =None,caliber_id=None,isDelCitycol=True,isNa2Null=False):
+    def transLoad(self,df:pd.DataFrame,time_col = 'DATE',cityid_col = 'CITY_ID',city_id:int =None,caliber_id=None,isDelCitycol=True,isNa2Null=False,dup_policy='latest'):
         """
         用于处理负荷数据,将负荷数据转为日期+地市ID+96时刻负荷的形式
         
@@ -118,23 +339,29 @@ class TimeSeriesTransform(object):
             caliber_id:int 需要删选的口径id，默认为None，输出所有口径数据
             isDelCitycol:bool 是否直接删除cityid_col
             isNa2Null:bool 是否将数据中的NaN转为null
+            dup_policy:str 同一日期、地市、口径存在多行时的处理方式,见dropDuplicateDates,填入None时不处理,默认为'latest'
         Returns:
         ----------
             DataFrame
         """
-        # 将地市id、口径id转为int型
-        df[[cityid_col,'CALIBER_ID']] = df[[cityid_col,'CALIBER_ID']].astype(int)
+        # 将地市id、口径id转为int型, 由buildQuery按口径筛选的数据不含口径列
+        int_cols = [c for c in [cityid_col,'CALIBER_ID'] if c in df.columns]
+        df[int_cols] = df[int_cols].astype(int)
         # 将日期列转为时间格式，如超出时间范围则替换为NaT
         df[time_col] = pd.to_datetime(df[time_col], errors = 'coerce')
 
-        if caliber_id:
+        if caliber_id and 'CALIBER_ID' in df.columns:
             df = df[df['CALIBER_ID']==caliber_id]
 
         # 删除时间列为空的行
         df.dropna(subset=[time_col],inplace=True)
 
+        # 处理重复上传的数据, 需在剔除UPDATETIME列之前进行
+        if dup_policy:
+            df,_ = self.dropDuplicateDates(df,time_col,key_cols=[c for c in [cityid_col,'CALIBER_ID'] if c in df.columns],policy=dup_policy)
+
         # 剔除无用列
-        df = df.drop(['ID','CALIBER_ID','CREATETIME','UPDATETIME','T2400'],axis=1)
+        df = df.drop(['ID','CALIBER_ID','CREATETIME','UPDATETIME','T2400'],axis=1,errors='ignore')
 
         # 重置列名
         if len(df.columns) == 96+2:      
@@ -159,7 +386,7 @@ class TimeSeriesTransform(object):
         
         return df
     
-    def transWeather(self,df:pd.DataFrame,time_col = 'DATE',cityid_col = 'CITY_ID',city_id = None,isNa2Null=False,isDelCitycol=True,isStat=False):
+    def transWeather(self,df:pd.DataFrame,time_col = 'DATE',cityid_col = 'CITY_ID',city_id = None,isNa2Null=False,isDelCitycol=True,isStat=False,dup_policy='latest'):
         """
         用于处理气象数据,将气象数据转为日期+地市ID+96时刻负荷的形式
         
@@ -172,6 +399,7 @@ class TimeSeriesTransform(object):
             isNa2Null:bool 是否将数据中的NaN转为null
             isDelCitycol:bool 是否直接将cityid_col这一列删除
             isStat:bool 是否生成温度最大值、最小值和均值列
+            dup_policy:str 同一日期、地市、气象类型存在多行时的处理方式,见dropDuplicateDates,填入None时不处理,默认为'latest'
         Returns:
         ----------
             DataFrame
@@ -183,31 +411,22 @@ class TimeSeriesTransform(object):
         # 删除时间列为空的行
         df.dropna(subset=[time_col],inplace=True)
 
+        # 处理重复上传的数据, 需在剔除UPDATETIME列之前进行
+        if dup_policy:
+            df,_ = self.dropDuplicateDates(df,time_col,key_cols=[c for c in [cityid_col,'TYPE'] if c in df.columns],policy=dup_policy)
+
         # 剔除无用列
-        df = df.drop(['ID','TYPE','CREATETIME','UPDATETIME','T2400'],axis=1)
+        df = df.drop(['ID','TYPE','CREATETIME','UPDATETIME','T2400'],axis=1,errors='ignore')
 
         # 重置列名
-        if len(df.columns) == 96+2:      
-            df.columns = [time_col] + [cityid_col] + self.freq96
-            # 生成统计列
-            if isStat:
-                df['MAX'] = df.loc[:,self.freq96].max(1)
-                df['MIN'] = df.loc[:,self.freq96].min(1)
-                df['AVG'] = df.loc[:,self.freq96].mean(1)
-        elif len(df.columns) == 48+2:
-            df.columns = [time_col] + [cityid_col] + self.freq48
-            # 生成统计列
-            if isStat:
-                df['MAX'] = df.loc[:,self.freq48].max(1)
-                df['MIN'] = df.loc[:,self.freq48].min(1)
-                df['AVG'] = df.loc[:,self.freq48].mean(1)
-        elif len(df.columns) == 24+2:
-            df.columns = [time_col] + [cityid_col] + self.freq24
+        if len(df.columns) in [96+2,48+2,24+2]:
+            point_cols = self.num2freq[len(df.columns)-2]
+            df.columns = [time_col] + [cityid_col] + point_cols
             # 生成统计列
             if isStat:
-                df['MAX'] = df.loc[:,self.freq24].max(1)
-                df['MIN'] = df.loc[:,self.freq24].min(1)
-                df['AVG'] = df.loc[:,self.freq24].mean(1)
+                stat = self.__dailyStat(df[point_cols].astype(float).values,point_cols,['MAX','MIN','AVG'])
+                for stat_name,values in stat.items():
+                    df[stat_name] = values
         
         # 将空值都转换为Nan
         df.fillna(np.nan,inplace=True)
@@ -227,6 +446,85 @@ class TimeSeriesTransform(object):
         return df
     
 
+    def dropDuplicateDates(self,df:pd.DataFrame,time_col:str='DATE',key_cols:list=None,policy:str='latest',update_col:str='UPDATETIME',isWarn:bool=True):
+        """
+        处理同一日期(及同一地市、口径等)存在多行数据的情况, 如重复上传导致的UPDATETIME不同的多行数据
+
+        Parameters:
+        ----------
+            df:Dataframe
+                待处理的数据
+            time_col:str
+                日期列名称,默认为"DATE"
+            key_cols:list
+                除日期列外共同决定唯一行的列,如['CITY_ID','CALIBER_ID'],默认为None只按日期判断
+            policy:str
+                重复数据的处理方式,默认为'latest'
+                'latest':保留update_col最新的一行,df中不含update_col时保留最后出现的一行
+                'first':保留最先出现的一行
+                'mean':时刻列取各行均值(忽略空值),其它列保留最先出现的值
+                'complete':保留时刻值缺失最少的一行,缺失数相同时按'latest'规则选择
+            update_col:str
+                数据更新时间列名称,默认为"UPDATETIME"
+            isWarn:bool
+                存在重复数据时是否打印重复日期并发出警告,默认为True
+        Returns:
+        ----------
+            (DataFrame, DataFrame) 去重后的数据(保持原有行顺序),以及形如 日期列+key_cols+COUNT 的重复数据报告
+        """
+        if policy not in ['latest','first','mean','complete']:
+            raise ValueError('The "policy" can only be entered as "latest", "first", "mean" or "complete"!')
+        keys = [time_col] + [c for c in (key_cols or []) if c != time_col]
+        missing_cols = [c for c in keys if c not in df.columns]
+        if missing_cols:
+            raise KeyError('{} is not in the column of "df" !'.format(missing_cols))
+
+        # 无重复数据时直接返回, 仅需一次哈希去重判断
+        dup = df.duplicated(subset=keys,keep=False)
+        if not dup.any():
+            return df,pd.DataFrame(columns=keys+['COUNT'])
+
+        report = df.loc[dup,keys].groupby(keys,sort=True).size().rename('COUNT').reset_index()
+        if isWarn:
+            print('---- 以下日期存在重复数据, 按"{}"方式处理:'.format(policy))
+            print(report.to_string(index=False))
+            warnings.warn('{} duplicate keys ({} rows) found in "df", resolved by policy "{}"'.format(len(report),int(dup.sum()),policy))
+
+        # 只对重复的行进行处理, 其余行保持不变; 全部按行位置处理, 不依赖索引是否唯一(如多次查询结果concat后的数据)
+        dup_pos = np.flatnonzero(dup.values)
+        rows = df.iloc[dup_pos]
+        point_cols = [c for c in rows.columns if re.match(r'^T\d{4}$',str(c))]
+        if not point_cols:
+            point_cols = [c for c in rows.columns if c not in keys+[update_col]]
+        has_update = update_col in rows.columns
+
+        if policy in ['first','mean']:
+            kept_idx = np.flatnonzero(~rows.duplicated(subset=keys,keep='first').values)
+            kept = rows.iloc[kept_idx]
+            if policy == 'mean':
+                kept = kept.copy()
+                values = rows[point_cols].apply(pd.to_numeric,errors='coerce')
+                # groupby(sort=False)的分组顺序与keep='first'保留行的顺序一致
+                kept[point_cols] = values.groupby([rows[k].values for k in keys],sort=False,dropna=False).mean().values
+        else:
+            # np.lexsort以最后一个键为主键: 依次按缺失点数、更新时间、行位置升序, 每组取最后一行
+            sort_keys = [np.arange(len(rows))]
+            if has_update:
+                # NaT转为int64最小值, 排在最前
+                sort_keys.append(pd.to_datetime(rows[update_col],errors='coerce').values.astype('int64'))
+            if policy == 'complete':
+                sort_keys.append(rows[point_cols].notna().sum(axis=1).values)
+            order = np.lexsort(sort_keys)
+            is_last = ~rows.iloc[order].duplicated(subset=keys,keep='last').values
+            kept_idx = np.sort(order[is_last])
+            kept = rows.iloc[kept_idx]
+
+        # 按原有行位置恢复顺序
+        keep_pos = np.flatnonzero(~dup.values)
+        position = np.concatenate([keep_pos,dup_pos[kept_idx]])
+        df = pd.concat([df.iloc[keep_pos],kept]).iloc[np.argsort(position,kind='mergesort')]
+        return df,report
+
     def table2col(self,df:pd.DataFrame, time_col:str='DATE', y_col:str='load', freq:int=96,index_type:str='normal'):
         """
         此方法支持将97列、49列、25列日期+对应时间频次数据的Dataframe转换为1列索引为日期+指定时刻和对应时刻数据的Dataframe。
@@ -258,7 +556,8 @@ class TimeSeriesTransform(object):
         elif time_col not in df.columns and time_col != df.index.name:
             raise KeyError('"{}" is not in the column or index of "df" !'.format(time_col))
         # 判断日期是否存在重复，重复则保留第一个值，删除并打印重复日期索引，报警告
-        
+        df,_ = self.dropDuplicateDates(df,time_col=time_col,policy='first')
+
         # 输入的dataframe列数必须为97，49或25其中之一
         if len(df.columns) not in [97,49,25]:
             raise TypeError('The number of "df" columns needs to be 97, 49 or 25, please adjust the input dataframe')
@@ -362,4 +661,248 @@ class TimeSeriesTransform(object):
         
         return df_table
 
-        
\ No newline at end of file
+        
+    def __toMatrix(self,df:pd.DataFrame,time_col:str='DATE'):
+        """将日期+时刻列的Dataframe转换为连续日期的 天数×时刻数 矩阵, 缺失日期以NaN补齐
+
+        Returns
+        ----------
+            (连续日期的DatetimeIndex, 时刻列名列表, float矩阵)
+        """
+        if time_col not in df.columns and time_col == df.index.name:
+            df = df.reset_index()
+        elif time_col not in df.columns:
+            raise KeyError('"{}" is not in the column or index of "df" !'.format(time_col))
+        point_cols = [c for c in df.columns if c != time_col]
+        if len(point_cols) not in [96,48,24]:
+            raise TypeError('The number of "df" columns needs to be 97, 49 or 25, please adjust the input dataframe')
+
+        dates = pd.to_datetime(df[time_col])
+        if dates.duplicated().any():
+            raise ValueError('There are duplicate dates in "df", please remove them first (e.g. dropDuplicateDates) !')
+        values = df[point_cols].apply(pd.to_numeric,errors='coerce').values.astype(float)
+        full_dates = pd.date_range(dates.min(),dates.max(),freq='d')
+        matrix = np.full((len(full_dates),len(point_cols)),np.nan)
+        matrix[(dates - full_dates[0]).dt.days.values] = values
+        return full_dates,point_cols,matrix
+
+    def __detectAnomaly(self,matrix:np.ndarray,flat_points:int,spike_thresh:float):
+        """在整个 天数×时刻数 矩阵上检测缺失点、死数(连续不变)和突变点
+
+        Returns
+        ----------
+            (缺失点掩码, 死数掩码, 突变点掩码), 形状均与matrix相同
+        """
+        x = matrix.ravel()
+        missing = np.isnan(x)
+
+        # 死数: 连续flat_points个及以上相同值(跨日连续计算)
+        change = np.r_[True,x[1:] != x[:-1]]
+        run_id = np.cumsum(change) - 1
+        run_len = np.bincount(run_id)[run_id]
+        flat = (run_len >= flat_points) & ~missing
+
+        # 突变点: 与前后各两点中位数的偏差超过spike_thresh倍稳健标准差
+        spike = np.zeros_like(missing)
+        if len(x) >= 5:
+            neighbors = np.vstack([x[:-4],x[1:-3],x[3:-1],x[4:]])
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore',category=RuntimeWarning)
+                # 仅对含缺失值的位置使用较慢的nanmedian
+                ref = np.median(neighbors,axis=0)
+                has_nan = np.isnan(ref)
+                if has_nan.any():
+                    ref[has_nan] = np.nanmedian(neighbors[:,has_nan],axis=0)
+                resid = x[2:-2] - ref
+                scale = 1.4826*np.nanmedian(np.abs(resid - np.nanmedian(resid)))
+            if scale > 0:
+                with np.errstate(invalid='ignore'):
+                    spike[2:-2] = np.abs(resid) > spike_thresh*scale
+        shape = matrix.shape
+        return missing.reshape(shape),flat.reshape(shape),spike.reshape(shape)
+
+    def checkQuality(self,df:pd.DataFrame,time_col:str='DATE',flat_points:int=8,spike_thresh:float=6.0)->pd.DataFrame:
+        """
+        对日期+96时刻/48时刻/24时刻的数据进行数据质量检测, 一次性在整个 天数×时刻数 矩阵上检测缺失点、死数、突变点和整日缺失
+
+        Parameters:
+        ----------
+            df:Dataframe
+                待检测的数据,数据列数必须为97、49、25列其中之一,同时,需包含日期列。
+            time_col:str
+                用于定位时间列,默认为"DATE"
+            flat_points:int
+                连续不变的点数达到该值时判定为死数,默认为8
+            spike_thresh:float
+                突变点判定阈值,为稳健标准差的倍数,默认为6.0
+        Returns:
+        ----------
+            DataFrame 以连续日期为索引,包含MISSING(缺失点数)、FLAT(死数点数)、SPIKE(突变点数)、DAY_MISSING(是否整日缺失)、IS_VALID(是否无任何异常)列
+        """
+        dates,_,matrix = self.__toMatrix(df,time_col)
+        missing,flat,spike = self.__detectAnomaly(matrix,flat_points,spike_thresh)
+        return self.__qualityFrame(dates,time_col,missing,flat,spike)
+
+    def __qualityFrame(self,dates,time_col,missing,flat,spike)->pd.DataFrame:
+        """汇总每日数据质量"""
+        quality = pd.DataFrame({
+            'MISSING':missing.sum(1),
+            'FLAT':flat.sum(1),
+            'SPIKE':spike.sum(1),
+            'DAY_MISSING':missing.all(1),
+        },index=dates)
+        quality['IS_VALID'] = ~(missing | flat | spike).any(1)
+        quality.index.name = time_col
+        return quality
+
+    def fillGaps(self,df:pd.DataFrame,time_col:str='DATE',method:str='linear',fill_flat:bool=False,fill_spike:bool=True,flat_points:int=8,spike_thresh:float=6.0):
+        """
+        对日期+96时刻/48时刻/24时刻的数据进行质量检测并填补缺失点、整日缺失及(可选)死数、突变点
+
+        Parameters:
+        ----------
+            df:Dataframe
+                待处理的数据,数据列数必须为97、49、25列其中之一,同时,需包含日期列。
+            time_col:str
+                用于定位时间列,默认为"DATE"
+            method:str
+                填补方式,可填入'linear'(跨日线性插值)、'lastday'(前一日同时刻值)、'weekday'(上周同一星期同时刻值),默认为'linear'。
+                'lastday'和'weekday'无法填补的点(如起始日期的缺失)再使用线性插值填补
+            fill_flat:bool
+                是否将死数视为缺失进行填补,默认为False
+            fill_spike:bool
+                是否将突变点视为缺失进行填补,默认为True
+            flat_points:int
+                连续不变的点数达到该值时判定为死数,默认为8
+            spike_thresh:float
+                突变点判定阈值,为稳健标准差的倍数,默认为6.0
+        Returns:
+        ----------
+            (DataFrame, DataFrame) 填补后的连续日期数据(日期列为datetime类型),以及checkQuality格式的每日数据质量
+        """
+        if method not in ['linear','lastday','weekday']:
+            raise ValueError('The "method" can only be entered as "linear", "lastday" or "weekday"!')
+
+        dates,point_cols,matrix = self.__toMatrix(df,time_col)
+        missing,flat,spike = self.__detectAnomaly(matrix,flat_points,spike_thresh)
+        quality = self.__qualityFrame(dates,time_col,missing,flat,spike)
+
+        mask = missing.copy()
+        if fill_flat:
+            mask |= flat
+        if fill_spike:
+            mask |= spike
+        matrix = np.where(mask,np.nan,matrix)
+
+        if method == 'lastday':
+            matrix = pd.DataFrame(matrix).ffill().values
+        elif method == 'weekday':
+            matrix = pd.DataFrame(matrix).groupby(dates.weekday.values).ffill().values
+
+        # 线性插值(跨日连续), 同时处理其它方式无法填补的点
+        x = matrix.ravel()
+        nan_idx = np.isnan(x)
+        if nan_idx.any() and not nan_idx.all():
+            x[nan_idx] = np.interp(np.flatnonzero(nan_idx),np.flatnonzero(~nan_idx),x[~nan_idx])
+
+        df_out = pd.DataFrame(x.reshape(matrix.shape),columns=point_cols)
+        df_out.insert(0,time_col,dates)
+        return df_out,quality
+
+    def __dailyStat(self,matrix:np.ndarray,point_cols:list,stats:list,cdd_base:float=26.0,hdd_base:float=18.0)->dict:
+        """在 天数×时刻数 矩阵上一次性计算每日统计量, 缺失值不参与计算
+
+        Returns
+        ----------
+            key为统计量名称, value为每日统计值数组的字典
+        """
+        valid = ~np.isnan(matrix)
+        count = valid.sum(1)
+        has_value = count > 0
+        result = {}
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore',category=RuntimeWarning)
+            for stat in stats:
+                if stat == 'MAX':
+                    result[stat] = np.nanmax(matrix,axis=1)
+                elif stat == 'MIN':
+                    result[stat] = np.nanmin(matrix,axis=1)
+                elif stat == 'AVG':
+                    result[stat] = np.nanmean(matrix,axis=1)
+                elif stat == 'STD':
+                    result[stat] = np.nanstd(matrix,axis=1)
+                elif stat in ['MAXTIME','MINTIME']:
+                    fill = -np.inf if stat == 'MAXTIME' else np.inf
+                    func = np.argmax if stat == 'MAXTIME' else np.argmin
+                    idx = func(np.where(valid,matrix,fill),axis=1)
+                    result[stat] = np.where(has_value,np.array(point_cols,dtype=object)[idx],None)
+                elif stat == 'CDD':
+                    # 度日数: 各时刻超出/低于基准温度的度数的日均值
+                    result[stat] = np.where(has_value,np.nansum(np.clip(matrix-cdd_base,0,None),axis=1)/np.maximum(count,1),np.nan)
+                elif stat == 'HDD':
+                    result[stat] = np.where(has_value,np.nansum(np.clip(hdd_base-matrix,0,None),axis=1)/np.maximum(count,1),np.nan)
+                else:
+                    raise ValueError('"{}" is not a supported statistic, please enter MAX, MIN, AVG, STD, MAXTIME, MINTIME, CDD or HDD !'.format(stat))
+        return result
+
+    def weatherStat(self,df:pd.DataFrame,time_col:str='DATE',cityid_col:str=None,stats:list=['MAX','MIN','AVG'],cdd_base:float=26.0,hdd_base:float=18.0,rolling:list=None,isEfileFormat:bool=False):
+        """
+        用于计算气象数据(温度、湿度、风速、降水等)的每日统计特征, 所有地市、所有统计量在整个 天数×时刻数 矩阵上一次计算完成
+
+        Parameters:
+        ----------
+            df:Dataframe
+                日期(+地市ID)+96时刻/48时刻/24时刻形式的气象数据, 如transWeather(isDelCitycol=False)的输出
+            time_col:str
+                df中日期列的名称,默认为"DATE"
+            cityid_col:str
+                df中地市id列的名称,默认为None即df中只有一个地市
+            stats:list
+                需计算的统计量,可填入'MAX','MIN','AVG','STD','MAXTIME'(最大值出现时刻),'MINTIME'(最小值出现时刻),
+                'CDD'(高于cdd_base的度日数),'HDD'(低于hdd_base的度日数),默认为['MAX','MIN','AVG']
+            cdd_base:float
+                计算CDD的基准值,默认为26.0
+            hdd_base:float
+                计算HDD的基准值,默认为18.0
+            rolling:list
+                多日滑动均值的天数列表,如[3,7]会对stats中的数值型统计量生成AVG_3D、AVG_7D等列,默认为None
+            isEfileFormat:bool
+                是否输出为raw.e文件*Stat数据块的格式,为True时日期列名为'Date'、格式为'%Y%m%d',
+                且指定cityid_col时返回key为地市ID的字典,可直接赋值给InsertEFile的humidityStat、windStat、precipitationStat等属性
+        Returns:
+        ----------
+            DataFrame或dict
+        """
+        if time_col not in df.columns and time_col == df.index.name:
+            df = df.reset_index()
+        point_cols = [c for c in self.freq96 if c in df.columns]
+        if len(point_cols) not in [96,48,24]:
+            raise TypeError('The number of time columns in "df" needs to be 96, 48 or 24, please adjust the input dataframe')
+
+        key_cols = [time_col] + ([cityid_col] if cityid_col else [])
+        result = df[key_cols].copy()
+        result[time_col] = pd.to_datetime(result[time_col])
+        stat = self.__dailyStat(df[point_cols].astype(float).values,point_cols,stats,cdd_base,hdd_base)
+        for stat_name,values in stat.items():
+            result[stat_name] = values
+
+        if rolling:
+            # 按地市、日期排序后计算以日期为窗口的滑动均值, 日期不连续时窗口仍按自然日计算
+            result = result.sort_values(key_cols[::-1]).reset_index(drop=True)
+            num_cols = [c for c in stats if c not in ['MAXTIME','MINTIME']]
+            groups = result[cityid_col].values if cityid_col else np.zeros(len(result))
+            indexed = result.set_index(time_col)[num_cols]
+            for n in rolling:
+                roll = indexed.groupby(groups).rolling('{}d'.format(n),min_periods=1).mean()
+                roll = roll.reset_index(level=0,drop=True)
+                for c in num_cols:
+                    result['{}_{}D'.format(c,n)] = roll[c].values
+
+        if not isEfileFormat:
+            return result
+
+        result = result.rename(columns={time_col:'Date'})
+        result['Date'] = result['Date'].dt.strftime('%Y%m%d')
+        if not cityid_col:
+            return result
+        return {city_id:group.drop(cityid_col,axis=1).reset_index(drop=True) for city_id,group in result.groupby(cityid_col)}
@@ -2,7 +2,9 @@ import matplotlib.pyplot as plt
 from timeseries_tools.TimeSeriesTransform import TimeSeriesTransform as tst
 import numpy as np
 import pandas as pd 
+import hashlib
 import warnings
+from collections import OrderedDict
 warnings.filterwarnings("ignore", category=FutureWarning)
 warnings.filterwarnings("ignore", category=RuntimeWarning)
 
@@ -11,37 +13,53 @@ class TimeSeriseTestReport(object):
     用于输出批量测算各类统计值和图示
     
     """    
-    def __init__(self,date_col:str):
+    def __init__(self,date_col:str,cache_size:int=32):
                             
         """初始化96时刻列名称,节假日日期信息及定位日期列
 
         Parameters
         ----------
         date_col: 日期列名称
+        cache_size: 转换结果缓存的最大数量, 同一份数据在多次绘图和统计中只转换一次, 为0时不缓存, by default 32
         """        
         self.date_col = date_col
+        self.cache_size = cache_size
+        self.__cache = OrderedDict()
         self.freq96 = ["T"+ "{:02d}".format(m) + "{:02d}".format(h) for m in range(0,24) for h in range(0,60,15)]
         self.holidays = pd.read_csv(r'./timeseries_tools/节假日信息.csv'
                                     ,usecols=['Date'],converters={'Date':lambda x:str(pd.to_datetime(x))[0:10]},squeeze=True)
+        self.adjustdays = pd.read_csv(r'./timeseries_tools/调休日信息.csv'
+                                    ,usecols=['Date'],converters={'Date':lambda x:str(pd.to_datetime(x))[0:10]},squeeze=True)
 
-    def __trans2merge(self,real_load:pd.DataFrame,fc_load:pd.DataFrame):        
-        """用于将日期+96时刻的实际负荷与预测负荷转为2列竖向数据, 再按照日期索引进行合并
+    def __table2col(self,df:pd.DataFrame,y_col:str)->pd.DataFrame:
+        """带缓存的table2col, 以数据内容的哈希值为键, 数据变化后自动重新转换
 
         Parameters
         ----------
-        real_load
-            实际负荷, 数据格式需为日期+96时刻负荷值的形式
-        fc_load
-            预测负荷, 数据格式需为日期+96时刻负荷值的形式
-
-        Returns
-        -------
-            形如日期(self.date_col), 实际负荷值(LOAD_real), 预测负荷值的Dataframe(LOAD_pre)
-        """        
-        real_load = tst().table2col(df=real_load,time_col=self.date_col,y_col='LOAD')
-        fc_load = tst().table2col(df=fc_load,time_col=self.date_col,y_col='LOAD')
-        merge_result = pd.merge(real_load,fc_load,how='inner',left_index=True,right_index=True,suffixes=['_real','_pre'])
-        return merge_result
+        df
+            数据格式需为日期+96时刻值的形式
+        y_col
+            转换后信息列的列名
+        """
+        if self.cache_size <= 0:
+            return tst().table2col(df=df,time_col=self.date_col,y_col=y_col)
+
+        if self.date_col not in df.columns and self.date_col == df.index.name:
+            df = df.reset_index()
+        content = pd.util.hash_pandas_object(df,index=False).values
+        key = (hashlib.md5(content.tobytes()).hexdigest(),tuple(df.columns),y_col)
+
+        if key in self.__cache:
+            self.__cache.move_to_end(key)
+        else:
+            self.__cache[key] = tst().table2col(df=df.copy(),time_col=self.date_col,y_col=y_col)
+            if len(self.__cache) > self.cache_size:
+                self.__cache.popitem(last=False)
+        return self.__cache[key].copy()
+
+    def clearCache(self):
+        """清空转换结果缓存"""
+        self.__cache.clear()
 
     def RMSPE(self,real_load, fc_load):
         """用于计算模型精度,精度计算方式为1-RMSPE
@@ -94,7 +112,7 @@ class TimeSeriseTestReport(object):
         return result
 
     
-    def WetherHolidayAcc(self,real_load:pd.DataFrame,fc_load:pd.DataFrame):
+    def WetherHolidayAcc(self,real_load:pd.DataFrame,fc_load:pd.DataFrame,daily_acc:pd.DataFrame=None):
         """用于计算节假日的模型平均精度和非节假日的模型平均精度, 数据格式需为日期+96时刻负荷值的形式
 
         Parameters
@@ -103,29 +121,21 @@ class TimeSeriseTestReport(object):
             实际负荷, 数据格式需为日期+96时刻负荷值的形式
         fc_load
             预测负荷, 数据格式需为日期+96时刻负荷值的形式
+        daily_acc, optional
+            已计算的DailyAcc结果, 传入时不再重复计算每日精度, by default None
         """        
-        # 计算节假日精度
-        r_h = real_load.loc[real_load[self.date_col].isin(self.holidays)]
-        p_h = fc_load.loc[fc_load[self.date_col].isin(self.holidays)]
-        # 转换并合并
-        rp_h = self.__trans2merge(r_h,p_h)
-
-        rmspe_h = rp_h.resample('d').apply(lambda x:self.RMSPE(x['LOAD_real'],x['LOAD_pre'])).to_frame(name='rmspe')
-
-        # 计算非节假日精度
-        r_n = real_load.loc[~real_load[self.date_col].isin(self.holidays)]
-        p_n = fc_load.loc[~fc_load[self.date_col].isin(self.holidays)]
-        # 转换并合并
-        rp_n = self.__trans2merge(r_n,p_n)
+        if daily_acc is None:
+            daily_acc = self.DailyAcc(real_load,fc_load)
+        is_holiday = daily_acc['daytype'] == 'holiday'
+        rmspe_h = daily_acc.loc[is_holiday,'rmspe'].mean()
+        rmspe_n = daily_acc.loc[~is_holiday,'rmspe'].mean()
 
-        rmspe_n = rp_n.resample('d').apply(lambda x:self.RMSPE(x['LOAD_real'],x['LOAD_pre'])).to_frame(name='rmspe')
+        print('节假日平均精度：{}，非节假日平均精度：{}'.format(rmspe_h,rmspe_n)) 
 
-        print('节假日平均精度：{}，非节假日平均精度：{}'.format(rmspe_h['rmspe'].mean(),rmspe_n['rmspe'].mean())) 
+        return float(rmspe_h),float(rmspe_n)
 
-        return float(rmspe_h.mean()),float(rmspe_n.mean())
 
-
-    def MonthlyAcc(self,real_load:pd.DataFrame,fc_load:pd.DataFrame,isDelHoliday=True):
+    def MonthlyAcc(self,real_load:pd.DataFrame,fc_load:pd.DataFrame,isDelHoliday=True,daily_acc:pd.DataFrame=None):
         """用于计算模型每月平均精度, 数据格式需为日期+96时刻负荷值的形式
 
         Parameters
@@ -136,21 +146,20 @@ class TimeSeriseTestReport(object):
             预测负荷, 数据格式需为日期+96时刻负荷值的形式
         isDelHoliday, optional
             是否剔除节假日, by default True
+        daily_acc, optional
+            已计算的DailyAcc结果, 传入时不再重复计算每日精度, by default None
         """        
+        rmspe_date = self.DailyAcc(real_load,fc_load) if daily_acc is None else daily_acc
         if isDelHoliday:# 剔除节假日日期
-            real_load = real_load.loc[~real_load[self.date_col].isin(self.holidays)]
-            fc_load = fc_load.loc[~fc_load[self.date_col].isin(self.holidays)]
+            rmspe_date = rmspe_date[rmspe_date['daytype']!='holiday']
 
-        result = self.__trans2merge(real_load,fc_load)
-        result = pd.merge(real_load,fc_load,how='inner',left_index=True,right_index=True,suffixes=['_real','_pre'])
-        rmspe_date = result.resample('d').apply(lambda x:self.RMSPE(x['LOAD_real'],x['LOAD_pre'])).to_frame(name='rmspe')
         rmspe_month = rmspe_date.resample('M')['rmspe'].mean().to_frame().reset_index()
         rmspe_month[self.date_col] = rmspe_month[self.date_col].dt.strftime('%Y-%m')
         print('==== 每月平均精度 ==== ')
         print(rmspe_month)
         return rmspe_month
     
-    def PeakValleyAcc(self,real_load:pd.DataFrame,fc_load:pd.DataFrame,time_interval=[[1,7],[8,12],[13,16],[17,19],[20,23]],isDelHoliday=True):
+    def PeakValleyAcc(self,real_load:pd.DataFrame,fc_load:pd.DataFrame,time_interval=[[1,7],[8,12],[13,16],[17,19],[20,23]],isDelHoliday=True,aligned:tuple=None):
         """用于计算不同时间段最大值与最小值的平均精度, 数据格式需为日期+96时刻负荷值的形式
 
         Parameters
@@ -163,38 +172,58 @@ class TimeSeriseTestReport(object):
             时间段列表, 可采用列表嵌套的方式输入多个时间段 by default [[1,7],[8,12],[13,16],[17,19],[20,23]]
         isDelHoliday, optional
             是否剔除节假日, by default True
+        aligned, optional
+            已计算的AlignMatrix(real_load,fc_load)结果, 传入时不再重复对齐, by default None
         """        
-
+        dates,r,p = self.AlignMatrix(real_load,fc_load) if aligned is None else aligned
         if isDelHoliday:# 剔除节假日日期
-            real_load = real_load.loc[~real_load[self.date_col].isin(self.holidays)]
-            fc_load = fc_load.loc[~fc_load[self.date_col].isin(self.holidays)]
-
-        rf_merge = self.__trans2merge(real_load,fc_load)
-
-        rf_merge['Month'] = rf_merge[self.date_col].dt.month #提取月份 
-        rf_merge['Day'] = rf_merge[self.date_col].dt.day #提取天数 
-        rf_merge['Hour'] = rf_merge[self.date_col].dt.hour #提取小时
+            keep = ~dates.strftime('%Y-%m-%d').isin(self.holidays)
+            r,p = r[keep],p[keep]
         print('==== 高峰低谷时间段平均精度 ====')
         max_val,min_val =[],[]
         for times in time_interval:
-            # 提取指定时间区间
-            time_filtered = rf_merge.loc[(rf_merge['Hour'] >=times[0]) & (rf_merge['Hour'] <times[1]),:]
-            # 提取最大值索引
-            max_value = pd.DataFrame(time_filtered.groupby(['Month','Day'])['LOAD_real'].max()).reset_index()
-            min_value = pd.DataFrame(time_filtered.groupby(['Month','Day'])['LOAD_real'].min()).reset_index()
-
-            result_max = pd.merge(rf_merge,max_value,on=['Month','Day','LOAD_real'],how='inner')[[self.date_col,'LOAD_real','LOAD_pre']].dropna()
-            result_min = pd.merge(rf_merge,min_value,on=['Month','Day','LOAD_real'],how='inner')[[self.date_col,'LOAD_real','LOAD_pre']].dropna()
+            # 提取指定时间区间内每日最大值、最小值所在时刻
+            max_mask = self.ExtremeMask(r,p,times,isMax=True)
+            min_mask = self.ExtremeMask(r,p,times,isMax=False)
 
-            rmspe_max = self.RMSPE(result_max['LOAD_real'],result_max['LOAD_pre'])
-            rmspe_min = self.RMSPE(result_min['LOAD_real'],result_min['LOAD_pre'])
+            rmspe_max = self.RMSPE(r[max_mask],p[max_mask])
+            rmspe_min = self.RMSPE(r[min_mask],p[min_mask])
             max_val.append([times,rmspe_max])
             min_val.append([times,rmspe_min])
             print('{}点至{}点最大值平均精度:{:.5f}'.format(times[0],times[1],rmspe_max))
             print('{}点至{}点最小值平均精度:{:.5f}'.format(times[0],times[1],rmspe_min))
         return max_val,min_val
+
+    def ExtremeMask(self,real:np.ndarray,fc:np.ndarray,times:list,isMax=True)->np.ndarray:
+        """用于定位每日指定时间区间内实际负荷最大值(或最小值)所在的时刻, 并列最大值均会被选中, 预测值缺失的时刻不选
+
+        Parameters
+        ----------
+        real
+            实际负荷的 天数×时刻数 矩阵, 如AlignMatrix的输出
+        fc
+            预测负荷的 天数×时刻数 矩阵
+        times
+            时间区间[起始小时, 结束小时), 如[8,12]
+        isMax, optional
+            是否定位最大值, 为False时定位最小值, by default True
+
+        Returns
+        -------
+            与real形状相同的bool矩阵
+        """
+        hours = np.arange(real.shape[1])*24//real.shape[1]
+        in_interval = (hours >= times[0]) & (hours < times[1])
+        sub = np.where(in_interval,real,np.nan)
+        has_value = ~np.isnan(sub).all(1)
+        extreme = np.full(len(real),np.nan)
+        if has_value.any():
+            func = np.nanmax if isMax else np.nanmin
+            extreme[has_value] = func(sub[has_value],axis=1)
+        with np.errstate(invalid='ignore'):
+            return (sub == extreme[:,None]) & ~np.isnan(fc)
     
-    def WeeklyAcc(self,real_load:pd.DataFrame,fc_load:pd.DataFrame,isDelHoliday=True):
+    def WeeklyAcc(self,real_load:pd.DataFrame,fc_load:pd.DataFrame,isDelHoliday=True,daily_acc:pd.DataFrame=None):
         """用于统计不同星期类型(工作日、休息日)的平均精度, 数据格式需为日期+96时刻负荷值的形式
 
         Parameters
@@ -205,20 +234,116 @@ class TimeSeriseTestReport(object):
             预测负荷, 数据格式需为日期+96时刻负荷值的形式
         isDelHoliday, optional
             是否剔除节假日, by default True
+        daily_acc, optional
+            已计算的DailyAcc结果, 传入时不再重复计算每日精度, by default None
         """        
+        if daily_acc is None:
+            daily_acc = self.DailyAcc(real_load,fc_load)
         if isDelHoliday:# 剔除节假日日期
-            real_load = real_load.loc[~real_load[self.date_col].isin(self.holidays)]
-            fc_load = fc_load.loc[~fc_load[self.date_col].isin(self.holidays)]
+            daily_acc = daily_acc[daily_acc['daytype']!='holiday']
 
-        rf_merge = self.__trans2merge(real_load,fc_load).reset_index()
+        week_acc = daily_acc.groupby('weekday')['rmspe'].mean().reindex(range(1,8))
         print('==== 各星期类型平均精度 ====')
         val = []
-        for week in range(0,7):
-            temp_week = rf_merge[rf_merge[self.date_col].dt.weekday==week].set_index(self.date_col).resample('d').apply(lambda x:self.RMSPE(x['LOAD_real'],x['LOAD_pre']))
-            rmspe = temp_week.mean()
-            print('周{}:'.format('日' if week+1==7 else week+1),rmspe)
-            val.append([week+1,rmspe])
+        for week,rmspe in week_acc.items():
+            print('周{}:'.format('日' if week==7 else week),rmspe)
+            val.append([week,rmspe])
         return val
+
+    def AlignMatrix(self,real_load:pd.DataFrame,*fc_loads:pd.DataFrame):
+        """用于将实际负荷与一个或多个预测负荷按共同日期对齐为 天数×时刻数 矩阵, 数据格式需为日期+96时刻负荷值的形式
+
+        Parameters
+        ----------
+        real_load
+            实际负荷, 数据格式需为日期+96时刻负荷值的形式
+        fc_loads
+            一个或多个预测负荷, 数据格式需为日期+96时刻负荷值的形式
+
+        Returns
+        -------
+            (共同日期的DatetimeIndex, 实际负荷矩阵, 预测负荷矩阵1, 预测负荷矩阵2, ...), 重复日期保留最先出现的一行
+        """
+        def toMatrix(df):
+            if self.date_col not in df.columns and self.date_col == df.index.name:
+                df = df.reset_index()
+            # 与table2col一致, 重复日期保留最先出现的一行
+            df = df.assign(**{self.date_col:pd.to_datetime(df[self.date_col])})
+            df,_ = tst().dropDuplicateDates(df,time_col=self.date_col,policy='first')
+            values = df.drop(self.date_col,axis=1).values.astype(float)
+            return pd.DataFrame(values,index=df[self.date_col])
+
+        frames = [toMatrix(df) for df in (real_load,)+fc_loads]
+        dates = frames[0].index
+        for frame in frames[1:]:
+            dates = dates.intersection(frame.index)
+        dates = dates.sort_values()
+        return (dates,)+tuple(frame.loc[dates].values for frame in frames)
+
+    def DailyAcc(self,real_load:pd.DataFrame,fc_load:pd.DataFrame,aligned:tuple=None)->pd.DataFrame:
+        """用于一次性计算每日精度(1-RMSPE)及年份、月份、星期、日类型、季节等分组标签, 数据格式需为日期+96时刻负荷值的形式
+
+        Parameters
+        ----------
+        real_load
+            实际负荷, 数据格式需为日期+96时刻负荷值的形式
+        fc_load
+            预测负荷, 数据格式需为日期+96时刻负荷值的形式
+        aligned, optional
+            已计算的AlignMatrix(real_load,fc_load)结果, 传入时不再重复对齐, by default None
+
+        Returns
+        -------
+            以日期为索引, 包含rmspe, year, month(年-月), weekday(1-7), daytype(holiday、adjusted、normal), season(spring、summer、autumn、winter)列的Dataframe。
+            存在缺失值的日期精度为NaN
+        """
+        dates,r,p = self.AlignMatrix(real_load,fc_load) if aligned is None else aligned
+        # 与RMSPE一致: 当日存在缺失值时精度为NaN
+        rmspe = 1 - np.sqrt(np.mean(np.square((p - r)/r),axis=1))
+
+        daily_acc = pd.DataFrame({'rmspe':rmspe},index=dates)
+        daily_acc.index.name = self.date_col
+        return daily_acc.join(self.__dayLabels(dates))
+
+    def __dayLabels(self,dates:pd.DatetimeIndex)->pd.DataFrame:
+        """生成日期的年份、月份、星期、日类型、季节标签"""
+        labels = pd.DataFrame(index=dates)
+        labels.index.name = self.date_col
+        labels['year'] = dates.year
+        labels['month'] = dates.strftime('%Y-%m')
+        labels['weekday'] = dates.weekday + 1
+        date_str = dates.strftime('%Y-%m-%d')
+        labels['daytype'] = np.select([date_str.isin(self.holidays),date_str.isin(self.adjustdays)],['holiday','adjusted'],'normal')
+        labels['season'] = np.array(['winter','spring','summer','autumn'])[dates.month % 12 // 3]
+        return labels
+
+    def GroupedAcc(self,real_load:pd.DataFrame,fc_load:pd.DataFrame,by=['month'],isDelHoliday=False)->pd.DataFrame:
+        """用于按年份、月份、星期、日类型、季节的任意组合统计平均精度, 每日精度只计算一次, 数据格式需为日期+96时刻负荷值的形式
+
+        Parameters
+        ----------
+        real_load
+            实际负荷, 数据格式需为日期+96时刻负荷值的形式
+        fc_load
+            预测负荷, 数据格式需为日期+96时刻负荷值的形式
+        by, optional
+            分组方式, 可填入'year','month','weekday','daytype','season'中的一个或多个, by default ['month']
+        isDelHoliday, optional
+            是否剔除节假日, by default False
+
+        Returns
+        -------
+            形如分组列, rmspe(平均精度), days(有效天数)的Dataframe
+        """
+        by = [by] if isinstance(by,str) else list(by)
+        for key in by:
+            if key not in ['year','month','weekday','daytype','season']:
+                raise ValueError('"{}" is not supported, "by" can only be entered "year", "month", "weekday", "daytype" or "season" !'.format(key))
+
+        daily_acc = self.DailyAcc(real_load,fc_load)
+        if isDelHoliday:# 剔除节假日日期
+            daily_acc = daily_acc[daily_acc['daytype']!='holiday']
+        return daily_acc.groupby(by)['rmspe'].agg(rmspe='mean',days='count').reset_index()
         
     
     def plot1Picture(self,real_load:pd.DataFrame,fc_load:pd.DataFrame,real_weather:pd.DataFrame,fc_weather:pd.DataFrame,isSave=False):
@@ -240,10 +365,10 @@ class TimeSeriseTestReport(object):
         import plotly
         import plotly.graph_objects as go
 
-        real_load = tst().table2col(df=real_load,time_col=self.date_col,y_col='LOAD')
-        fc_load = tst().table2col(df=fc_load,time_col=self.date_col,y_col='LOAD')
-        real_weather = tst().table2col(df=real_weather,time_col=self.date_col,y_col='TEMP')
-        fc_weather = tst().table2col(df=fc_weather,time_col=self.date_col,y_col='TEMP')
+        real_load = self.__table2col(real_load,'LOAD')
+        fc_load = self.__table2col(fc_load,'LOAD')
+        real_weather = self.__table2col(real_weather,'TEMP')
+        fc_weather = self.__table2col(fc_weather,'TEMP')
 
         real_load = go.Scatter(
             x=real_load.index, y=real_load.iloc[:,0], mode='lines'
@@ -298,10 +423,10 @@ class TimeSeriseTestReport(object):
         import plotly.graph_objects as go
         from plotly.subplots import make_subplots
         
-        real_load = tst().table2col(df=real_load,time_col=self.date_col,y_col='LOAD')
-        fc_load = tst().table2col(df=fc_load,time_col=self.date_col,y_col='LOAD')
-        real_weather = tst().table2col(df=real_weather,time_col=self.date_col,y_col='TEMP')
-        fc_weather = tst().table2col(df=fc_weather,time_col=self.date_col,y_col='TEMP')
+        real_load = self.__table2col(real_load,'LOAD')
+        fc_load = self.__table2col(fc_load,'LOAD')
+        real_weather = self.__table2col(real_weather,'TEMP')
+        fc_weather = self.__table2col(fc_weather,'TEMP')
 
         fig = make_subplots(rows=2,cols=1,subplot_titles=["实际负荷、预测负荷曲线", "实际温度、预测温度曲线"],shared_xaxes=True)
         opacity=0.9
@@ -343,9 +468,9 @@ class TimeSeriseTestReport(object):
         import plotly
         import plotly.graph_objects as go
 
-        real_load = tst().table2col(df=real_load,time_col=self.date_col,y_col='LOAD')
-        newalgo_load = tst().table2col(df=newalgo_load,time_col=self.date_col,y_col='LOAD')
-        oldalgo_load = tst().table2col(df=oldalgo_load,time_col=self.date_col,y_col='LOAD')
+        real_load = self.__table2col(real_load,'LOAD')
+        newalgo_load = self.__table2col(newalgo_load,'LOAD')
+        oldalgo_load = self.__table2col(oldalgo_load,'LOAD')
 
 
         real_load = go.Scatter(
@@ -397,12 +522,12 @@ class TimeSeriseTestReport(object):
         import plotly.graph_objects as go
         from plotly.subplots import make_subplots
         
-        real_load = tst().table2col(df=real_load,time_col=self.date_col,y_col='LOAD')
-        newalgo_load = tst().table2col(df=newalgo_load,time_col=self.date_col,y_col='LOAD')
-        oldalgo_load = tst().table2col(df=oldalgo_load,time_col=self.date_col,y_col='LOAD')
+        real_load = self.__table2col(real_load,'LOAD')
+        newalgo_load = self.__table2col(newalgo_load,'LOAD')
+        oldalgo_load = self.__table2col(oldalgo_load,'LOAD')
 
-        real_weather = tst().table2col(df=real_weather,time_col=self.date_col,y_col='TEMP')
-        fc_weather = tst().table2col(df=fc_weather,time_col=self.date_col,y_col='TEMP')
+        real_weather = self.__table2col(real_weather,'TEMP')
+        fc_weather = self.__table2col(fc_weather,'TEMP')
 
         fig = make_subplots(rows=2,cols=1,subplot_titles=["实际负荷与新旧算法预测负荷对比曲线", "实际温度、预测温度曲线"],shared_xaxes=True)
         opacity=0.9
@@ -432,6 +557,107 @@ class TimeSeriseTestReport(object):
         if isSave:
             plotly.offline.plot(fig, filename='./contrastAlgo2Plot.html')
 
+    def __signTest(self,wins:np.ndarray,losses:np.ndarray)->np.ndarray:
+        """批量计算配对符号检验的精确双侧p值, 差值为0的样本不计入
+
+        二项分布尾部概率在对数空间中求和, 所有算法对一次计算完成
+
+        Parameters
+        ----------
+        wins
+            各算法对中前者精度更高的天数
+        losses
+            各算法对中后者精度更高的天数
+        """
+        wins,losses = np.asarray(wins,dtype=int),np.asarray(losses,dtype=int)
+        n = wins + losses
+        k = np.minimum(wins,losses)
+        if n.size == 0:
+            return np.ones(n.shape)
+        # log(i!), i = 0...max(n)
+        log_fact = np.concatenate([[0.0],np.cumsum(np.log(np.arange(1,n.max()+1)))])
+        i = np.arange(k.max()+1)
+        # log(C(n,i)/2^n), 超出k的项不计入
+        log_term = log_fact[n][:,None] - log_fact[i][None,:] - log_fact[np.maximum(n[:,None]-i[None,:],0)] - n[:,None]*np.log(2)
+        log_term = np.where(i[None,:] <= k[:,None],log_term,-np.inf)
+        top = log_term.max(axis=1)
+        tail = np.exp(top)*np.exp(log_term - top[:,None]).sum(axis=1)
+        return np.where(n == 0,1.0,np.minimum(1.0,2*tail))
+
+    def contrastAlgoN(self,real_load:pd.DataFrame,fc_loads:dict,isDelHoliday=False)->dict:
+        """用于对比任意多个算法(或参数配置)的预测结果, 所有预测结果与实际负荷一次对齐为 算法数×天数×时刻数 的矩阵后统一计算, 数据格式需为日期+96时刻负荷值的形式
+
+        Parameters
+        ----------
+        real_load
+            实际负荷, 数据格式需为日期+96时刻负荷值的形式
+        fc_loads
+            key为算法名称(如'Algo109'), value为该算法预测负荷的字典, 预测负荷数据格式需为日期+96时刻负荷值的形式
+        isDelHoliday, optional
+            是否剔除节假日, by default False
+
+        Returns
+        -------
+            字典, 包含:
+            metrics: 各算法的平均精度(rmspe)、整体精度(overall_rmspe)、平均绝对百分比误差(mape)、日最大负荷精度(peak_acc)及按平均精度的排名(rank)
+            win_rate: 各算法在各日类型(holiday、adjusted、normal)及全部日期(all)中每日精度最高的天数占比, 多个算法并列最高时平分该日
+            pairwise: 两两算法每日精度的平均差值(mean_diff)、胜率(win_rate_a, 平局不计为胜)及符号检验p值(p_value)
+            daily: 以日期为索引、各算法每日精度为列的Dataframe
+        """
+        names = list(fc_loads.keys())
+        if len(names) < 2:
+            raise ValueError('At least 2 forecast results are required in "fc_loads" !')
+        aligned = self.AlignMatrix(real_load,*fc_loads.values())
+        dates,r,p = aligned[0],aligned[1],np.stack(aligned[2:])
+        labels = self.__dayLabels(dates)
+        if isDelHoliday:# 剔除节假日日期
+            keep = (labels['daytype']!='holiday').values
+            dates,r,p,labels = dates[keep],r[keep],p[:,keep],labels[keep]
+
+        # 算法数×天数×时刻数
+        err = (p - r[None,:,:])/r[None,:,:]
+        sq = np.square(err)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore',category=RuntimeWarning)
+            daily = 1 - np.sqrt(np.mean(sq,axis=2))
+            metrics = pd.DataFrame({
+                'rmspe':np.nanmean(daily,axis=1),
+                'overall_rmspe':1 - np.sqrt(np.nanmean(sq.reshape(len(names),-1),axis=1)),
+                'mape':np.nanmean(np.abs(err).reshape(len(names),-1),axis=1),
+                'peak_acc':[1 - np.sqrt(sq[i][self.ExtremeMask(r,p[i],[0,24])].mean()) for i in range(len(names))],
+            },index=names)
+        metrics['rank'] = metrics['rmspe'].rank(ascending=False,method='min').astype(int)
+        metrics = metrics.sort_values('rank')
+
+        # 每日精度最高的算法, 只统计所有算法精度均有效的日期, 并列最高时平分
+        valid = ~np.isnan(daily).any(0)
+        is_best = daily[:,valid] == daily[:,valid].max(axis=0)
+        wins = pd.DataFrame((is_best/is_best.sum(axis=0)).T,columns=names)
+        wins['daytype'] = labels['daytype'].values[valid]
+        win_rate = wins.groupby('daytype').mean().T
+        win_rate['all'] = wins[names].mean()
+
+        # 两两算法对比: 算法数×算法数×天数, 与NaN的比较结果均为False
+        a,b = np.triu_indices(len(names),1)
+        both = ~np.isnan(daily[a]) & ~np.isnan(daily[b])
+        days = both.sum(axis=1)
+        win_a = (daily[a] > daily[b]).sum(axis=1)
+        win_b = (daily[a] < daily[b]).sum(axis=1)
+        with np.errstate(invalid='ignore',divide='ignore'):
+            mean_diff = np.where(both,daily[a] - daily[b],0).sum(axis=1)/days
+            win_rate_a = win_a/days
+        pairwise = pd.DataFrame({'algo_a':np.array(names,dtype=object)[a],'algo_b':np.array(names,dtype=object)[b],'days':days
+                                 ,'mean_diff':mean_diff,'win_rate_a':win_rate_a,'p_value':self.__signTest(win_a,win_b)})
+
+        daily = pd.DataFrame(daily.T,index=dates,columns=names)
+        daily.index.name = self.date_col
+
+        print('==== 各算法精度排名 ====')
+        print(metrics)
+        print('==== 各日类型最优算法占比 ====')
+        print(win_rate)
+        return {'metrics':metrics,'win_rate':win_rate,'pairwise':pairwise,'daily':daily}
+
     def outputReport(self,real_load,fc_load,time_interval=[[1,7],[8,12],[13,16],[17,19],[20,23]],path='./TestReport.txt',isDelHoliday=True):
         """输出全部测算信息
 
@@ -448,12 +674,26 @@ class TimeSeriseTestReport(object):
         isDelHoliday, optional
             是否剔除节假日, by default True
         """        
-        holiday_acc,no_holiday_acc = self.WetherHolidayAcc(real_load,fc_load)
+        # 对齐矩阵与每日精度只计算一次, 供各项统计共用
+        aligned = self.AlignMatrix(real_load,fc_load)
+        daily_acc = self.DailyAcc(real_load,fc_load,aligned=aligned)
+
+        holiday_acc,no_holiday_acc = self.WetherHolidayAcc(real_load,fc_load,daily_acc=daily_acc)
         every_points_acc = self.TimeShareEval(real_load,fc_load,isDelHoliday)
-        every_month_acc = self.MonthlyAcc(real_load,fc_load,isDelHoliday)
-        time_interval_max,time_interval_min = self.PeakValleyAcc(real_load,fc_load,time_interval,isDelHoliday)
-        week_day_acc = self.WeeklyAcc(real_load,fc_load,isDelHoliday)
+        every_month_acc = self.MonthlyAcc(real_load,fc_load,isDelHoliday,daily_acc=daily_acc)
+        time_interval_max,time_interval_min = self.PeakValleyAcc(real_load,fc_load,time_interval,isDelHoliday,aligned=aligned)
+        week_day_acc = self.WeeklyAcc(real_load,fc_load,isDelHoliday,daily_acc=daily_acc)
 
+        self.saveReport(path,holiday_acc,no_holiday_acc,every_points_acc,every_month_acc,time_interval_max,time_interval_min,week_day_acc)
+
+    def saveReport(self,path,holiday_acc,no_holiday_acc,every_points_acc,every_month_acc,time_interval_max,time_interval_min,week_day_acc):
+        """将各项测算结果写入测算报告文件, 各参数分别为WetherHolidayAcc、TimeShareEval、MonthlyAcc、PeakValleyAcc、WeeklyAcc的输出
+
+        Parameters
+        ----------
+        path
+            输出文件存储路径
+        """
         with open(path,'w+') as f:
             print('节假日平均精度{},剔除节假日平均精度{}'.format(holiday_acc,no_holiday_acc),file=f)
             print('==== 分时刻平均精度 ==== \n',every_points_acc.to_string(),file=f)
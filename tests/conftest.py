@@ -0,0 +1,31 @@
+"""测试公共配置
+
+仓库目录即timeseries_tools包本身, 测试时以timeseries_tools包名导入;
+TimeSeriseTestReport、InsertEFile按相对路径./timeseries_tools/读取节假日与调休日文件, 每个测试在包含这两个文件的临时目录下运行。
+"""
+import importlib.util
+import os
+import shutil
+import sys
+
+import pytest
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CALENDAR_FILES = ['节假日信息.csv','调休日信息.csv']
+
+if importlib.util.find_spec('timeseries_tools') is None:
+    spec = importlib.util.spec_from_file_location('timeseries_tools',os.path.join(PACKAGE_DIR,'__init__.py')
+                                                  ,submodule_search_locations=[PACKAGE_DIR])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['timeseries_tools'] = module
+    spec.loader.exec_module(module)
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path,monkeypatch):
+    calendar_dir = tmp_path / 'timeseries_tools'
+    calendar_dir.mkdir()
+    for name in CALENDAR_FILES:
+        shutil.copy(os.path.join(PACKAGE_DIR,name),str(calendar_dir / name))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,48 @@
+import os
+
+from timeseries_tools.BatchPipeline import BatchPipeline
+from timeseries_tools.Benchmark import GenerateLoadData, GenerateWeatherData
+
+
+def _config(path:str,weather_path:str=None)->dict:
+    source = {'type':'csv','load_path':path}
+    if weather_path:
+        source['weather_path'] = weather_path
+    return {'source':source,'cities':[1],'s_date':'20200101','e_date':'20201231','output_dir':'./output'}
+
+
+def _efile(path:str='./output/1_raw.e')->str:
+    # 首行为生成时间, 不参与比较
+    with open(path,encoding='utf8') as f:
+        return f.read().split('\n',1)[1]
+
+
+def test_csv_cache_invalidated_when_file_changes(workdir):
+    GenerateLoadData(1,1).to_csv('load.csv',index=False)
+    first = BatchPipeline(_config('load.csv')).run()
+    assert 'fetch' in first.index
+    first_efile = _efile()
+
+    second = BatchPipeline(_config('load.csv')).run()
+    assert 'cache' in second.index and 'fetch' not in second.index
+    assert _efile() == first_efile
+
+    # 替换csv文件后不能再使用旧缓存
+    GenerateLoadData(1,1,seed=1).to_csv('load.csv',index=False)
+    os.utime('load.csv',ns=(os.stat('load.csv').st_atime_ns,os.stat('load.csv').st_mtime_ns+10**9))
+    third = BatchPipeline(_config('load.csv')).run()
+    assert 'fetch' in third.index and 'cache' not in third.index
+
+
+def test_cached_rerun_with_weather_matches_first_run(workdir):
+    GenerateLoadData(1,1).to_csv('load.csv',index=False)
+    GenerateWeatherData(1,1).to_csv('weather.csv',index=False)
+    first = BatchPipeline(_config('load.csv','weather.csv')).run()
+    assert 'fetch' in first.index
+    first_efile = _efile()
+    assert '<LoadHistory>' in first_efile and '<WeatherHistory>' in first_efile
+
+    second = BatchPipeline(_config('load.csv','weather.csv')).run()
+    assert 'cache' in second.index and 'fetch' not in second.index
+    assert _efile() == first_efile
+    assert len(os.listdir('./output/cache')) == 2
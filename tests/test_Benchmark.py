@@ -0,0 +1,31 @@
+from timeseries_tools.Benchmark import Benchmark, main
+from timeseries_tools.TimeSeriesTransform import TimeSeriesTransform
+from timeseries_tools.TimeSeriseTestReport import TimeSeriseTestReport
+
+
+def test_compare_baseline_flags_errors_and_missing(workdir,monkeypatch):
+    bench = Benchmark(city_num=1,years=1,repeat=1)
+    result = bench.run(['transLoad','table2col'])
+    bench.saveBaseline(result[result['operation']=='transLoad'],'baseline.json')
+
+    def broken(self,*args,**kwargs):
+        raise RuntimeError('broken')
+
+    monkeypatch.setattr(TimeSeriesTransform,'transLoad',broken)
+    result = bench.run(['transLoad','table2col'])
+    assert result.set_index('operation').loc['transLoad','error'] == 'RuntimeError: broken'
+    compare = bench.compareBaseline(result,'baseline.json',tolerance=100)
+    # transLoad执行出错, table2col不在基准中
+    assert compare['regression'].to_dict() == {'transLoad':True,'table2col':True}
+
+
+def test_main_exit_code(workdir,monkeypatch):
+    argv = ['--cities','1','--repeat','1','--ops','MonthlyAcc','--baseline','baseline.json']
+    assert main(argv+['--save-baseline']) == 0
+    assert main(argv+['--tolerance','100']) == 0
+
+    def broken(self,*args,**kwargs):
+        raise RuntimeError('broken')
+
+    monkeypatch.setattr(TimeSeriseTestReport,'MonthlyAcc',broken)
+    assert main(argv+['--tolerance','100']) == 1
@@ -0,0 +1,24 @@
+import numpy as np
+
+from timeseries_tools.Benchmark import Benchmark
+from timeseries_tools.ChunkedReport import ChunkedReport, iterCsvMonths
+from timeseries_tools.TimeSeriseTestReport import TimeSeriseTestReport
+
+
+def test_chunked_report_matches_output_report(workdir):
+    bench = Benchmark(city_num=1,years=2,repeat=1)
+    real_load,fc_load = bench.real_load.copy(),bench.fc_load.copy()
+    for df in [real_load,fc_load]:
+        df['DATE'] = df['DATE'].dt.strftime('%Y-%m-%d')
+    # 包含缺失值的日期精度为NaN
+    fc_load.iloc[10,5] = np.nan
+    real_load.to_csv('real.csv',index=False)
+    fc_load.to_csv('fc.csv',index=False)
+
+    TimeSeriseTestReport('DATE').outputReport(real_load.copy(),fc_load.copy(),path='whole.txt')
+    report = ChunkedReport('DATE')
+    report.run(iterCsvMonths('real.csv',chunksize=777),iterCsvMonths('fc.csv',chunksize=1000))
+    report.writeReport('chunked.txt')
+
+    with open('whole.txt','rb') as f, open('chunked.txt','rb') as g:
+        assert f.read() == g.read()
@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pytest
+
+from timeseries_tools.Benchmark import Benchmark
+from timeseries_tools.EvalService import EvalService
+from timeseries_tools.HistoryStore import HistoryStore
+from timeseries_tools.TimeSeriseTestReport import TimeSeriseTestReport
+
+
+def _forecast(real_load,scale:float,seed:int):
+    rng = np.random.default_rng(seed)
+    fc_load = real_load.copy()
+    fc_load.iloc[:,1:] = fc_load.iloc[:,1:].values*(1+scale*rng.standard_normal((len(fc_load),96)))
+    return fc_load
+
+
+@pytest.fixture
+def data(workdir):
+    real_load = Benchmark(city_num=1,years=1,repeat=1).real_load.copy()
+    real_load['DATE'] = real_load['DATE'].dt.strftime('%Y-%m-%d')
+    store = HistoryStore('store')
+    store.append(1,'load',real_load)
+    store.append(1,'fc_a',_forecast(real_load,0.03,1))
+    os.makedirs('fc/1')
+    _forecast(real_load,0.05,2).to_csv('fc/1/fc_b.csv',index=False)
+    return real_load
+
+
+@pytest.fixture
+def server(data):
+    service = EvalService('store','fc')
+    httpd = service.createServer(port=0,quiet=True)
+    thread = threading.Thread(target=httpd.serve_forever,daemon=True)
+    thread.start()
+    yield service,'http://127.0.0.1:{}'.format(httpd.server_address[1])
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _get(url:str):
+    try:
+        with urllib.request.urlopen(url) as res:
+            return res.status,json.load(res)
+    except urllib.error.HTTPError as e:
+        return e.code,json.load(e)
+
+
+def test_metrics_round_trip(server,data):
+    _,base = server
+    status,result = _get(base+'/metrics?city=1&fc=fc_a&start=2020-01-01&end=2020-06-30&by=month')
+    assert status == 200
+
+    real_load = data[(data['DATE']>='2020-01-01')&(data['DATE']<='2020-06-30')]
+    fc_load = HistoryStore('store').toTable(1,'fc_a','2020-01-01','2020-06-30')
+    expected = TimeSeriseTestReport('DATE').GroupedAcc(real_load,fc_load,by='month')
+    assert [g['month'] for g in result['groups']] == expected['month'].tolist()
+    assert np.allclose([g['rmspe'] for g in result['groups']],expected['rmspe'])
+    assert result['overall']['days'] == int(expected['days'].sum())
+
+
+def test_curve_and_errors(server):
+    _,base = server
+    status,result = _get(base+'/curve?city=1&fc=fc_a,fc_b&start=2020-03-01&end=2020-03-01')
+    assert status == 200
+    assert len(result['time']) == 96 and result['time'][0] == '2020-03-01 00:00'
+    assert sorted(result['values']) == ['fc_a','fc_b','load']
+
+    assert _get(base+'/metrics?city=1')[0] == 400
+    assert _get(base+'/metrics?city=1&fc=fc_a&by=hour')[0] == 400
+    assert _get(base+'/metrics?city=1&fc=missing')[0] == 404
+    assert _get(base+'/unknown')[0] == 404
+
+    req = urllib.request.Request(base+'/clear',method='POST')
+    with urllib.request.urlopen(req) as res:
+        assert json.load(res) == {'status':'ok'}
+    assert all(c['size'] == 0 for c in _get(base+'/health')[1]['cache'].values())
+
+
+def test_reexported_csv_is_reloaded(server,data):
+    _,base = server
+    before = _get(base+'/metrics?city=1&fc=fc_b')[1]['overall']['rmspe']
+    assert _get(base+'/metrics?city=1&fc=fc_b')[1]['overall']['rmspe'] == before
+
+    _forecast(data,0.10,3).to_csv('fc/1/fc_b.csv',index=False)
+    stat = os.stat('fc/1/fc_b.csv')
+    os.utime('fc/1/fc_b.csv',ns=(stat.st_atime_ns,stat.st_mtime_ns+10**9))
+    after = _get(base+'/metrics?city=1&fc=fc_b')[1]['overall']['rmspe']
+    assert after < before - 0.01
+
+
+def test_cold_query_does_not_block_warm_query(server):
+    service,base = server
+    assert _get(base+'/metrics?city=1&fc=fc_a')[0] == 200
+
+    daily_acc = service.report.DailyAcc
+    started = threading.Event()
+
+    def slow(*args,**kwargs):
+        started.set()
+        time.sleep(1.0)
+        return daily_acc(*args,**kwargs)
+    service.report.DailyAcc = slow
+
+    cold = threading.Thread(target=_get,args=(base+'/metrics?city=1&fc=fc_b',))
+    cold.start()
+    assert started.wait(5)
+    start = time.perf_counter()
+    assert _get(base+'/metrics?city=1&fc=fc_a&by=season')[0] == 200
+    assert time.perf_counter() - start < 0.5
+    cold.join()
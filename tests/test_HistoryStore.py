@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from timeseries_tools.HistoryStore import HistoryStore
+from timeseries_tools.TimeSeriesTransform import TimeSeriesTransform as tst
+
+
+def _daily(s_date:str,days:int,offset:float=0.0)->pd.DataFrame:
+    # 各日取值为当日序号+offset, 便于核对写入位置
+    dates = pd.date_range(s_date,periods=days,freq='d')
+    df = pd.DataFrame(np.repeat(np.arange(days,dtype=float)[:,None]+offset,24,axis=1),columns=tst().freq24)
+    df.insert(0,'DATE',dates.strftime('%Y-%m-%d'))
+    return df
+
+
+def _column(store:HistoryStore,name:str='load'):
+    dates,mm = store.read(1,name)
+    return dates.strftime('%Y-%m-%d').tolist(),np.array(mm)[:,0].tolist()
+
+
+def test_append_after_with_gap_fills_nan(workdir):
+    store = HistoryStore('store')
+    store.append(1,'load',_daily('2021-01-01',3))
+    store.append(1,'load',_daily('2021-01-06',2,offset=10))
+
+    dates,values = _column(store)
+    assert dates == list(pd.date_range('2021-01-01','2021-01-07',freq='d').strftime('%Y-%m-%d'))
+    assert values[:3] == [0,1,2]
+    assert np.isnan(values[3:5]).all()
+    assert values[5:] == [10,11]
+    assert store.dateRange(1,'load') == (pd.Timestamp('2021-01-01'),pd.Timestamp('2021-01-07'))
+
+
+def test_append_before_shifts_existing_rows(workdir):
+    store = HistoryStore('store')
+    store.append(1,'load',_daily('2021-01-05',3))
+    # 向前扩展且与原区间不连续时, 已有数据整体后移, 中间以NaN补齐
+    store.append(1,'load',_daily('2021-01-01',2,offset=10))
+
+    dates,values = _column(store)
+    assert dates[0] == '2021-01-01' and dates[-1] == '2021-01-07'
+    assert values[:2] == [10,11]
+    assert np.isnan(values[2:4]).all()
+    assert values[4:] == [0,1,2]
+
+
+def test_append_overlap_overwrites_and_extends_both_sides(workdir):
+    store = HistoryStore('store')
+    store.append(1,'load',_daily('2021-01-03',3))
+    store.append(1,'load',_daily('2021-01-01',7,offset=10))
+
+    dates,values = _column(store)
+    assert dates == list(pd.date_range('2021-01-01','2021-01-07',freq='d').strftime('%Y-%m-%d'))
+    assert values == [10,11,12,13,14,15,16]
+
+
+def test_read_out_of_range_is_clipped(workdir):
+    store = HistoryStore('store')
+    store.append(1,'load',_daily('2021-01-01',5))
+
+    dates,mm = store.read(1,'load','2020-12-01','2021-01-02')
+    assert dates.strftime('%Y-%m-%d').tolist() == ['2021-01-01','2021-01-02']
+    assert np.array(mm)[:,0].tolist() == [0,1]
+
+    dates,mm = store.read(1,'load','2021-01-04','2021-03-01')
+    assert np.array(mm)[:,0].tolist() == [3,4]
+
+    for s_date,e_date in [('2021-02-01','2021-02-05'),('2020-01-01','2020-01-05'),('2021-01-03','2021-01-02')]:
+        dates,mm = store.read(1,'load',s_date,e_date)
+        assert len(dates) == 0 and mm.shape == (0,24)
+
+
+def test_index_persists_across_instances(workdir):
+    store = HistoryStore('store')
+    store.addCity(1,'city_a')
+    store.append(1,'load',_daily('2021-01-01',3))
+    store.append(2,'temperature',_daily('2021-01-02',2))
+
+    reopened = HistoryStore('store')
+    assert reopened.cities().to_dict('records') == store.cities().to_dict('records')
+    reopened.append(1,'load',_daily('2021-01-04',1,offset=3))
+    assert _column(HistoryStore('store'))[1] == [0,1,2,3]
+    assert HistoryStore('store').toTable(2,'temperature').equals(store.toTable(2,'temperature'))
+
+
+@pytest.mark.parametrize('dates',[
+    ['2021-01-01',None,'2021-01-03'],
+    ['2021-01-01 00:00','2021-01-02 12:00','2021-01-03 00:00'],
+    ['2021-01-01','2021-01-02','2021-01-02'],
+])
+def test_append_rejects_invalid_dates(workdir,dates):
+    store = HistoryStore('store')
+    store.append(1,'load',_daily('2021-01-01',2))
+    df = _daily('2021-01-01',3,offset=10)
+    df['DATE'] = dates
+    with pytest.raises(ValueError):
+        store.append(1,'load',df)
+    # 已有数据与目录不变
+    assert _column(HistoryStore('store')) == (['2021-01-01','2021-01-02'],[0,1])
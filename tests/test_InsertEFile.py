@@ -0,0 +1,43 @@
+import pandas as pd
+
+from timeseries_tools.InsertEFile import InsertEFile
+
+
+def _load(days:int,s_date:str='2021-01-01')->pd.DataFrame:
+    col_name = InsertEFile('20210101','20210101','unused.e').col_name
+    df = pd.DataFrame([[i+j for j in range(96)] for i in range(days)],columns=col_name[1:])
+    df.insert(0,'Date',pd.date_range(s_date,periods=days,freq='d').strftime('%Y%m%d'))
+    return df
+
+
+def _block(path:str,label:str)->str:
+    with open(path,encoding='utf8') as f:
+        text = f.read()
+    start = text.index('<{}>'.format(label))
+    return text[start:text.index('</{}>'.format(label),start)]
+
+
+def _tokens(block:str)->list:
+    # 分块写入时各块的列宽不同, raw.e以空白分隔, 按字段比较
+    return [line.split() for line in block.splitlines()]
+
+
+def test_chunks_match_dataframe(workdir):
+    df = _load(5)
+    InsertEFile('20210101','20210105','whole.e',{'LoadHistory':df}).GenerateEfile()
+    chunks = [df.iloc[0:0],df.iloc[0:2],df.iloc[2:2],df.iloc[2:5]]
+    InsertEFile('20210101','20210105','chunk.e',{'LoadHistory':lambda: iter(chunks)}).GenerateEfile()
+    assert _tokens(_block('chunk.e','LoadHistory')) == _tokens(_block('whole.e','LoadHistory'))
+
+
+def test_leading_empty_chunk_writes_header_once(workdir):
+    df = _load(3)
+    InsertEFile('20210101','20210103','chunk.e',{'LoadHistory':[df.iloc[0:0],df]}).GenerateEfile()
+    assert _block('chunk.e','LoadHistory').count('@  Date  T0000') == 1
+
+
+def test_empty_stream_writes_header(workdir):
+    InsertEFile('20210101','20210103','whole.e',{'LoadHistory':_load(0)}).GenerateEfile()
+    InsertEFile('20210101','20210103','chunk.e',{'LoadHistory':[]}).GenerateEfile()
+    assert _block('chunk.e','LoadHistory') == _block('whole.e','LoadHistory')
+    assert _block('chunk.e','LoadHistory').count('@  Date  T0000') == 1
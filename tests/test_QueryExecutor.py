@@ -0,0 +1,70 @@
+import sqlite3
+import time
+
+import pytest
+
+from timeseries_tools.Benchmark import GenerateLoadData
+from timeseries_tools.QueryExecutor import QueryExecutor
+from timeseries_tools.TimeSeriesTransform import TimeSeriesTransform
+
+
+@pytest.fixture
+def db(workdir):
+    conn = sqlite3.connect('q.db')
+    GenerateLoadData(3,1).to_sql('LOAD_96',conn,index=False)
+    conn.close()
+    return 'q.db'
+
+
+def test_run_all_keeps_input_order(db):
+    executor = QueryExecutor(None,None,db,None,'sqlite',max_workers=3)
+    sqls = {'c{}'.format(i):'SELECT * FROM LOAD_96 WHERE CITY_ID = {}'.format(i) for i in [3,1,2]}
+    result = executor.runAll(sqls,trans='load',trans_kwargs={'isDelCitycol':False})
+    assert list(result) == ['c3','c1','c2']
+    for key,df in result.items():
+        assert len(df) == 365
+        assert (df['CITY_ID'] == int(key[1])).all()
+
+    params = [{'city_id':i} for i in [2,3,1]]
+    result = executor.runAll(template='SELECT * FROM LOAD_96 WHERE CITY_ID = {city_id}',params=params)
+    assert [df['CITY_ID'].iloc[0] for df in result.values()] == [2,3,1]
+
+
+def test_run_with_bound_params(db):
+    tst = TimeSeriesTransform()
+    executor = QueryExecutor(None,None,db,None,'sqlite')
+    sqls = [tst.buildQuery('LOAD_96','load','sqlite',city_id=i,s_date='2020-02-01',e_date='2020-02-29') for i in [1,2]]
+    result = executor.runAll(sqls,trans='load')
+    assert [len(df) for df in result.values()] == [29,29]
+
+
+def test_retry_then_success(db,monkeypatch):
+    calls = []
+    connectDB = TimeSeriesTransform.connectDB
+
+    def flaky(self,*args,**kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError('connection reset')
+        return connectDB(self,*args,**kwargs)
+
+    monkeypatch.setattr(TimeSeriesTransform,'connectDB',flaky)
+    executor = QueryExecutor(None,None,db,None,'sqlite',retries=2,retry_wait=0.01)
+    result = executor.runAll(['SELECT * FROM LOAD_96 WHERE CITY_ID = 1'])
+    assert len(result[0]) == 365
+    assert len(calls) == 2
+
+
+def test_failure_after_retries(db):
+    executor = QueryExecutor(None,None,db,None,'sqlite',retries=2,retry_wait=0.01)
+    with pytest.raises(RuntimeError,match='after 3 attempts'):
+        executor.runAll(['SELECT * FROM NOT_EXISTS'])
+
+
+def test_timeout_interrupts_query(db):
+    executor = QueryExecutor(None,None,db,None,'sqlite',timeout=0.2,retries=0)
+    endless = 'WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x+1 FROM c) SELECT COUNT(*) FROM c'
+    start = time.perf_counter()
+    with pytest.raises(RuntimeError):
+        executor.runAll([endless])
+    assert time.perf_counter() - start < 5
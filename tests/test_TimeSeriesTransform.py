@@ -0,0 +1,227 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from timeseries_tools.TimeSeriesTransform import TimeSeriesTransform as tst
+
+
+def _uploads()->pd.DataFrame:
+    # 两次查询结果concat后索引均为0, 新上传的数据排在前面
+    new = pd.DataFrame({'DATE':['2021-01-01'],'T0000':[1.0],'T0015':[np.nan],'UPDATETIME':['2021-01-05']})
+    old = pd.DataFrame({'DATE':['2021-01-01'],'T0000':[2.0],'T0015':[5.0],'UPDATETIME':['2021-01-02']})
+    other = pd.DataFrame({'DATE':['2021-01-02'],'T0000':[3.0],'T0015':[3.0],'UPDATETIME':['2021-01-02']})
+    return pd.concat([other,new,old])
+
+
+@pytest.mark.parametrize('policy,expected',[('latest',1.0),('first',1.0),('mean',1.5),('complete',2.0)])
+def test_drop_duplicate_dates_non_unique_index(policy,expected):
+    df = _uploads()
+    assert not df.index.is_unique
+    out,report = tst().dropDuplicateDates(df,'DATE',policy=policy,isWarn=False)
+    assert out['DATE'].tolist() == ['2021-01-02','2021-01-01']
+    assert out['T0000'].tolist() == [3.0,expected]
+    assert report['COUNT'].tolist() == [2]
+
+
+def test_drop_duplicate_dates_latest_ignores_row_order():
+    df = _uploads().iloc[[0,2,1]]
+    out,_ = tst().dropDuplicateDates(df,'DATE',policy='latest',isWarn=False)
+    assert out['T0000'].tolist() == [3.0,1.0]
+
+
+def test_drop_duplicate_dates_clean_data_unchanged():
+    df = _uploads().iloc[[0,1]]
+    out,report = tst().dropDuplicateDates(df,'DATE',isWarn=False)
+    assert out is df
+    assert len(report) == 0
+
+
+def _wide(days:int,offset:float=0.0)->pd.DataFrame:
+    df = pd.DataFrame(np.arange(days*96,dtype=float).reshape(days,96)+offset,columns=tst().freq96)
+    df.insert(0,'DATE',pd.date_range('2021-01-01',periods=days,freq='d'))
+    return df
+
+
+def _loadTable(path:str):
+    import sqlite3
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE LOAD_LONG (DATE TEXT, TIME TEXT, LOAD REAL NOT NULL)')
+    conn.execute('CREATE UNIQUE INDEX UK_LOAD_LONG ON LOAD_LONG (DATE, TIME)')
+    conn.commit()
+    conn.close()
+
+
+def _query(path:str,sql:str):
+    return tst().connectDB(None,None,path,None,sql,'sqlite')
+
+
+def test_write_db_wide2long_row_count(workdir):
+    _loadTable('w.db')
+    written = tst().writeDB(_wide(3),None,None,'w.db',None,'LOAD_LONG','sqlite',isWide2Long=True,batch_size=100)
+    assert written == 3*96
+    df = _query('w.db','SELECT * FROM LOAD_LONG ORDER BY DATE, TIME')
+    assert len(df) == 3*96
+    assert df.iloc[0].tolist() == ['2021-01-01','00:00',0.0]
+    assert df.iloc[-1].tolist() == ['2021-01-03','23:45',3*96-1.0]
+
+
+def test_write_db_upsert_replaces_values(workdir):
+    _loadTable('w.db')
+    tst().writeDB(_wide(2),None,None,'w.db',None,'LOAD_LONG','sqlite',isWide2Long=True)
+    tst().writeDB(_wide(3,offset=1000),None,None,'w.db',None,'LOAD_LONG','sqlite',isWide2Long=True)
+    df = _query('w.db','SELECT * FROM LOAD_LONG ORDER BY DATE, TIME')
+    assert len(df) == 3*96
+    assert df['LOAD'].tolist() == (np.arange(3*96)+1000.0).tolist()
+
+
+def test_write_db_failed_batch_rolled_back(workdir):
+    _loadTable('w.db')
+    df = _wide(3)
+    # 第3天的数据违反NOT NULL约束, 按每天一批写入时第3批失败
+    df.loc[2,'T1200'] = np.nan
+    with pytest.raises(Exception):
+        tst().writeDB(df,None,None,'w.db',None,'LOAD_LONG','sqlite',isWide2Long=True,batch_size=96)
+    res = _query('w.db','SELECT DATE, COUNT(*) AS N FROM LOAD_LONG GROUP BY DATE ORDER BY DATE')
+    assert res['DATE'].tolist() == ['2021-01-01','2021-01-02']
+    assert res['N'].tolist() == [96,96]
+
+
+def test_build_query_keeps_calibers_and_latest_upload_apart(workdir):
+    import sqlite3
+    from timeseries_tools.Benchmark import GenerateLoadData
+
+    raw = GenerateLoadData(1,1,caliber_num=2)
+    # 口径1在首日重复上传, 新数据的UPDATETIME更晚
+    reupload = raw[(raw['CALIBER_ID']==1) & (raw['DATE']=='2020-01-01')].copy()
+    reupload[tst().freq96] = -1.0
+    reupload['UPDATETIME'] = '2020-01-02'
+    conn = sqlite3.connect('b.db')
+    pd.concat([raw,reupload]).to_sql('LOAD_96',conn,index=False)
+    conn.close()
+
+    sql,params = tst().buildQuery('LOAD_96','load','sqlite',city_id=1)
+    out = tst().transLoad(_query_params('b.db',sql,params),caliber_id=1)
+    expected = raw[raw['CALIBER_ID']==1].reset_index(drop=True)
+    assert len(out) == 365
+    assert out['DATE'].dt.strftime('%Y-%m-%d').tolist() == expected['DATE'].tolist()
+    assert (out.iloc[0,1:] == -1.0).all()
+    assert np.allclose(out.iloc[1:,1:].values.astype(float),expected.loc[1:,tst().freq96].values)
+
+    sql,params = tst().buildQuery('LOAD_96','load','sqlite',city_id=1,caliber_id=2)
+    assert 'CALIBER_ID' not in sql.split('FROM')[0]
+    out = tst().transLoad(_query_params('b.db',sql,params))
+    assert len(out) == 365
+    assert np.allclose(out.iloc[:,1:].values.astype(float),raw.loc[raw['CALIBER_ID']==2,tst().freq96].values)
+
+
+def _query_params(path:str,sql:str,params:list):
+    return tst().connectDB(None,None,path,None,sql,'sqlite',params=params)
+
+
+def _daily24(values:np.ndarray,s_date:str='2021-03-01')->pd.DataFrame:
+    df = pd.DataFrame(values,columns=tst().freq24)
+    df.insert(0,'DATE',pd.date_range(s_date,periods=len(df),freq='d'))
+    return df
+
+
+def test_check_quality_detects_missing_flat_spike_and_missing_days():
+    rng = np.random.default_rng(0)
+    t = np.arange(10*24)
+    m = (100 + 10*np.sin(2*np.pi*t/24) + rng.normal(0,0.5,len(t))).reshape(10,24)
+    m[1,5] = np.nan
+    m[2,3:13] = m[2,3]
+    m[3,10] += 50
+    df = _daily24(m).drop(index=5)
+
+    quality = tst().checkQuality(df)
+    assert len(quality) == 10
+    assert quality.index[5] == pd.Timestamp('2021-03-06')
+    assert quality['MISSING'].tolist() == [0,1,0,0,0,24,0,0,0,0]
+    assert quality['DAY_MISSING'].tolist() == [False]*5 + [True] + [False]*4
+    assert quality['FLAT'].tolist() == [0,0,10,0,0,0,0,0,0,0]
+    assert quality['SPIKE'].iloc[3] == 1
+    assert quality['IS_VALID'].tolist() == [True,False,False,False,True,False,True,True,True,True]
+
+
+def test_fill_gaps_linear_crosses_day_boundary():
+    m = np.arange(3*24,dtype=float).reshape(3,24)
+    expected = m.copy()
+    m[0,22:] = np.nan
+    m[1,:2] = np.nan
+    # 整日缺失同样按跨日线性插值填补
+    df = pd.concat([_daily24(m[:2]),_daily24(m[2:],'2021-03-04')])
+
+    out,quality = tst().fillGaps(df,method='linear')
+    assert out['DATE'].tolist() == list(pd.date_range('2021-03-01',periods=4,freq='d'))
+    assert quality['DAY_MISSING'].tolist() == [False,False,True,False]
+    assert np.allclose(out[tst().freq24].values[:2],expected[:2])
+    assert np.allclose(out[tst().freq24].values[2],np.linspace(expected[1,-1],expected[2,0],26)[1:-1])
+
+
+def test_fill_gaps_lastday_and_weekday_use_same_slot():
+    # 各日各时刻取值互不相同, 便于区分填补来源
+    m = 100*np.arange(15)[:,None] + np.arange(24)[None,:]**2.0
+    m[0,2] = np.nan   # 起始日缺失, 只能线性插值
+    m[8,3] = np.nan   # 上周同一星期为第1天
+    df = _daily24(m)
+
+    out,_ = tst().fillGaps(df,method='lastday',fill_spike=False)
+    values = out[tst().freq24].values
+    assert values[8,3] == m[7,3]
+    assert values[0,2] == (m[0,1]+m[0,3])/2
+
+    out,_ = tst().fillGaps(df,method='weekday',fill_spike=False)
+    values = out[tst().freq24].values
+    assert values[8,3] == m[1,3]
+    assert values[0,2] == (m[0,1]+m[0,3])/2
+
+
+def test_weather_stat_rolling_on_unsorted_cities():
+    # 每日各时刻取值相同, AVG即为该值; 地市2缺少03-02
+    rows = [(city,day,10.0*city+day) for city in [1,2] for day in range(4) if (city,day) != (2,1)]
+    df = _daily24(np.array([[v]*24 for _,_,v in rows]))
+    df['DATE'] = [pd.Timestamp('2021-03-01')+pd.Timedelta(days=day) for _,day,_ in rows]
+    df.insert(1,'CITY_ID',[city for city,_,_ in rows])
+    df = df.iloc[[4,0,6,2,5,1,3]]
+
+    stat = tst().weatherStat(df,cityid_col='CITY_ID',stats=['AVG'],rolling=[2])
+    assert stat['CITY_ID'].tolist() == [1,1,1,1,2,2,2]
+    assert stat['AVG'].tolist() == [10,11,12,13,20,22,23]
+    # 窗口按自然日计算, 03-03的前一日缺失时只取当日
+    assert stat['AVG_2D'].tolist() == [10,10.5,11.5,12.5,20,22,22.5]
+
+
+def test_weather_stat_time_and_degree_days():
+    m = np.full((3,24),np.nan)
+    m[0,:12],m[0,12:] = 30.0,10.0
+    m[0,5] = 35.0
+    m[1,:6] = 20.0
+    m[1,3] = 14.0
+    stat = tst().weatherStat(_daily24(m),stats=['MAX','MAXTIME','MINTIME','CDD','HDD'])
+
+    assert stat['MAXTIME'].tolist() == ['T0500','T0000',None]
+    assert stat['MINTIME'].tolist() == ['T1200','T0300',None]
+    assert np.isnan(stat['MAX'].iloc[2])
+    # 度日数为各有效时刻超出(低于)基准的度数均值
+    assert stat['CDD'].iloc[:2].tolist() == pytest.approx([(11*4+9)/24,0.0])
+    assert stat['HDD'].iloc[:2].tolist() == pytest.approx([12*8/24,4/6])
+    assert np.isnan(stat['CDD'].iloc[2]) and np.isnan(stat['HDD'].iloc[2])
+
+
+def test_weather_stat_efile_format_inserts_as_humidity_stat(workdir):
+    from timeseries_tools.InsertEFile import InsertEFile
+
+    m = np.arange(4*24,dtype=float).reshape(4,24)
+    df = _daily24(m)
+    df.insert(1,'CITY_ID',[1,1,2,2])
+    stat = tst().weatherStat(df,cityid_col='CITY_ID',stats=['AVG'],isEfileFormat=True)
+    assert set(stat) == {1,2}
+    assert list(stat[1].columns) == ['Date','AVG']
+
+    efile = InsertEFile('20210301','20210302','raw.e')
+    efile.humidityStat = stat[1]
+    efile.GenerateEfile()
+    with open('raw.e',encoding='utf8') as f:
+        text = f.read()
+    block = text[text.index('<HumidityStat>'):text.index('</HumidityStat>')]
+    assert [line.split() for line in block.splitlines()[1:]] == [['@','Date','AVG'],['#','20210301','11.5'],['#','20210302','35.5']]
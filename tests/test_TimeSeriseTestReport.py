@@ -0,0 +1,194 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from timeseries_tools.Benchmark import Benchmark
+from timeseries_tools.TimeSeriseTestReport import TimeSeriseTestReport
+from timeseries_tools.TimeSeriesTransform import TimeSeriesTransform
+
+
+def _loads():
+    bench = Benchmark(city_num=1,years=1,repeat=1)
+    real_load,fc_load = bench.real_load.copy(),bench.fc_load.copy()
+    for df in [real_load,fc_load]:
+        df['DATE'] = df['DATE'].dt.strftime('%Y-%m-%d')
+    return real_load,fc_load
+
+
+def test_output_report_computes_daily_acc_once(workdir,monkeypatch):
+    calls = {'DailyAcc':0,'AlignMatrix':0}
+    for name in calls:
+        method = getattr(TimeSeriseTestReport,name)
+
+        def spy(self,*args,_method=method,_name=name,**kwargs):
+            calls[_name] += 1
+            return _method(self,*args,**kwargs)
+        monkeypatch.setattr(TimeSeriseTestReport,name,spy)
+
+    real_load,fc_load = _loads()
+    TimeSeriseTestReport('DATE').outputReport(real_load,fc_load,path='TestReport.txt')
+    assert calls == {'DailyAcc':1,'AlignMatrix':1}
+
+
+def test_shared_daily_acc_matches_recomputed(workdir):
+    real_load,fc_load = _loads()
+    report = TimeSeriseTestReport('DATE')
+    aligned = report.AlignMatrix(real_load,fc_load)
+    daily_acc = report.DailyAcc(real_load,fc_load,aligned=aligned)
+    assert report.WetherHolidayAcc(real_load,fc_load,daily_acc=daily_acc) == report.WetherHolidayAcc(real_load,fc_load)
+    assert report.MonthlyAcc(real_load,fc_load,daily_acc=daily_acc).equals(report.MonthlyAcc(real_load,fc_load))
+    assert report.WeeklyAcc(real_load,fc_load,daily_acc=daily_acc) == report.WeeklyAcc(real_load,fc_load)
+    assert report.PeakValleyAcc(real_load,fc_load,aligned=aligned) == report.PeakValleyAcc(real_load,fc_load)
+
+
+def _constant_loads(errors:dict):
+    """实际负荷恒为100, 各算法每日预测值为100*(1+误差), 每日精度即为1-|误差|"""
+    dates = pd.date_range('2021-03-01',periods=len(next(iter(errors.values()))),freq='D').strftime('%Y-%m-%d')
+    real_load = pd.DataFrame(100.0,index=range(len(dates)),columns=range(96))
+    real_load.insert(0,'DATE',dates)
+    fc_loads = {}
+    for name,err in errors.items():
+        fc = pd.DataFrame(np.repeat(100*(1+np.array(err))[:,None],96,axis=1))
+        fc.insert(0,'DATE',dates)
+        fc_loads[name] = fc
+    return real_load,fc_loads
+
+
+def _exact_sign_test(wins,losses):
+    n,k = wins+losses,min(wins,losses)
+    return min(1.0,2*sum(math.comb(n,i) for i in range(k+1))/2**n)
+
+
+def test_contrast_algo_n_ranks_splits_ties_and_tests_pairs(workdir):
+    real_load,fc_loads = _constant_loads({
+        'A':[0.01,0.01,0.02,0.01,0.01,0.03]
+        ,'B':[0.02,0.01,0.01,0.02,0.02,0.02]
+        ,'C':[0.05,0.05,0.05,0.05,0.05,0.05]
+    })
+    result = TimeSeriseTestReport('DATE').contrastAlgoN(real_load,fc_loads)
+
+    assert list(result['metrics'].index) == ['A','B','C']
+    # 第二天A、B并列最高, 各计半天
+    win_rate = result['win_rate']['all']
+    assert win_rate.to_dict() == pytest.approx({'A':3.5/6,'B':2.5/6,'C':0.0})
+
+    pairwise = result['pairwise'].set_index(['algo_a','algo_b'])
+    assert list(pairwise.index) == [('A','B'),('A','C'),('B','C')]
+    assert pairwise['days'].tolist() == [6,6,6]
+    assert pairwise.loc[('A','B'),'mean_diff'] == pytest.approx(0.01/6)
+    assert pairwise['win_rate_a'].tolist() == pytest.approx([0.5,1.0,1.0])
+    assert pairwise['p_value'].tolist() == pytest.approx([_exact_sign_test(3,2),_exact_sign_test(6,0),_exact_sign_test(6,0)])
+
+
+def test_contrast_algo_n_p_values_match_exact_sign_test(workdir):
+    rng = np.random.default_rng(0)
+    days = 400
+    errors = {'A':rng.uniform(0,0.05,days),'B':rng.uniform(0,0.05,days),'C':rng.uniform(0.01,0.06,days)}
+    real_load,fc_loads = _constant_loads({k:np.round(v,3) for k,v in errors.items()})
+    result = TimeSeriseTestReport('DATE').contrastAlgoN(real_load,fc_loads)
+
+    daily = result['daily']
+    for _,row in result['pairwise'].iterrows():
+        diff = (daily[row['algo_a']] - daily[row['algo_b']]).values
+        assert row['p_value'] == pytest.approx(_exact_sign_test(int((diff > 0).sum()),int((diff < 0).sum())),rel=1e-9,abs=1e-300)
+
+
+def test_align_matrix_keeps_first_of_duplicated_dates(workdir):
+    real_load,fc_load = _loads()
+    dup = real_load.iloc[[10]].copy()
+    dup.iloc[0,1:] = -1.0
+    # 重复日期追加在最后, 且打乱行顺序
+    real_dup = pd.concat([real_load,dup]).iloc[::-1]
+    report = TimeSeriseTestReport('DATE')
+
+    dates,r,p = report.AlignMatrix(real_dup,fc_load)
+    expected = report.AlignMatrix(real_load,fc_load)
+    assert dates.equals(expected[0])
+    assert r.shape == p.shape == expected[1].shape
+    assert (r[10] == -1.0).all()
+    assert np.array_equal(np.delete(r,10,axis=0),np.delete(expected[1],10,axis=0))
+    assert len(report.DailyAcc(real_dup,fc_load)) == len(dates)
+
+
+def test_grouped_acc_matches_weekly_and_monthly(workdir):
+    real_load,fc_load = _loads()
+    report = TimeSeriseTestReport('DATE')
+
+    weekly = report.GroupedAcc(real_load,fc_load,by='weekday',isDelHoliday=True)
+    assert weekly['rmspe'].tolist() == pytest.approx([v for _,v in report.WeeklyAcc(real_load,fc_load)])
+
+    monthly = report.GroupedAcc(real_load,fc_load,by=['month'],isDelHoliday=True)
+    expected = report.MonthlyAcc(real_load,fc_load)
+    assert monthly['month'].tolist() == expected['DATE'].tolist()
+    assert monthly['rmspe'].tolist() == pytest.approx(expected['rmspe'].tolist())
+    assert monthly['days'].sum() == weekly['days'].sum()
+
+
+@pytest.fixture
+def frames(workdir):
+    real_load,fc_load = _loads()
+    real_load,fc_load = real_load.iloc[:30],fc_load.iloc[:30]
+    real_weather,fc_weather = real_load.copy(),fc_load.copy()
+    real_weather.iloc[:,1:] /= 100
+    fc_weather.iloc[:,1:] /= 100
+    return [(real_load,'LOAD'),(fc_load,'LOAD'),(real_weather,'TEMP'),(fc_weather,'TEMP')]
+
+
+@pytest.fixture
+def table2col_calls(frames,monkeypatch):
+    # Benchmark初始化时也会调用table2col, 需在生成frames之后再统计
+    calls = []
+    table2col = TimeSeriesTransform.table2col
+
+    def spy(self,*args,**kwargs):
+        calls.append(kwargs.get('y_col'))
+        return table2col(self,*args,**kwargs)
+    monkeypatch.setattr(TimeSeriesTransform,'table2col',spy)
+    return calls
+
+
+def test_table2col_cache_hit_miss_and_lru_bound(frames,table2col_calls):
+    report = TimeSeriseTestReport('DATE',cache_size=4)
+    table2col = report._TimeSeriseTestReport__table2col
+
+    first = [table2col(df,y_col) for df,y_col in frames]
+    assert len(table2col_calls) == 4
+    # 内容相同的新对象同样命中缓存, 返回副本, 修改结果不影响缓存
+    first[0].iloc[0,0] = -1.0
+    second = [table2col(df.copy(),y_col) for df,y_col in frames]
+    assert len(table2col_calls) == 4
+    assert second[0].iloc[0,0] != -1.0
+    assert all(a.iloc[1:].equals(b.iloc[1:]) for a,b in zip(first,second))
+
+    # 修改过的数据不命中缓存
+    edited = frames[0][0].copy()
+    edited.iloc[3,5] += 1
+    assert table2col(edited,'LOAD').iloc[3*96+4,0] == edited.iloc[3,5]
+    assert len(table2col_calls) == 5
+
+    # 缓存数量超过cache_size时淘汰最久未使用的结果: 此时frames[0]已被淘汰
+    table2col(frames[1][0],'LOAD')
+    assert len(table2col_calls) == 5
+    table2col(frames[0][0],'LOAD')
+    assert len(table2col_calls) == 6
+
+
+def test_table2col_cache_disabled(frames,table2col_calls):
+    report = TimeSeriseTestReport('DATE',cache_size=0)
+    for _ in range(2):
+        for df,y_col in frames:
+            report._TimeSeriseTestReport__table2col(df,y_col)
+    assert len(table2col_calls) == 8
+
+
+@pytest.mark.parametrize('cache_size,converted',[(4,4),(3,8),(0,8)])
+def test_plot1picture_reuses_conversions(frames,table2col_calls,monkeypatch,cache_size,converted):
+    go = pytest.importorskip('plotly.graph_objects')
+    monkeypatch.setattr(go.Figure,'show',lambda self,*args,**kwargs:None)
+    report = TimeSeriseTestReport('DATE',cache_size=cache_size)
+    for _ in range(2):
+        report.plot1Picture(*[df for df,_ in frames])
+    # 缓存不足4条时, 每次转换前都已淘汰下一次需要的结果
+    assert len(table2col_calls) == converted